@@ -0,0 +1,508 @@
+# ENSEMBLE RUNNER FOR THE WOLF-DEER-MODEL IN LOGGED FOREST
+
+# Author: Peter Kamal
+# Python version: 3.9.13
+# Last update: 17/10/26
+
+# Note: This script runs large sets of simulations of the model in 'ecol_1_model.py' in parallel and replaces the
+# commented-out multiprocessing code that used to sit at the bottom of the model script.
+# Replicates are handed out one at a time to a pool of worker processes, so a slow replicate does not stall the others.
+# Every replicate draws from its own numpy Generator seeded from a root seed and its replicate number (see
+# 'replicate_streams' in 'ecol_1_model.py'), so the results are identical whatever the number of workers.
+# Instead of one file per replicate, the results can be collected in one Parquet file per sweep (see 'ecol_1_results.py').
+# Each replicate receives its full parameter set as a ModelConfig, so one worker can run any number of sweep points
+# without re-importing the model or rebuilding its cached home ranges.
+# 'run_sweep' simulates the days before logging starts only once per replicate and continues this burn-in into every
+# logging intensity and policy from a snapshot (with the same results as separate runs with the same root seed).
+# With 'paired', replicate i draws its initial positions, logged cells and predation outcomes from separate Generators that
+# are the same in every scenario (common random numbers), so that scenarios can be compared replicate by replicate
+# (see the paired estimators in 'ecol_3_data_analysis.py'). Paired results differ from unpaired results with the same root seed.
+# With 'tracking', every replicate of run_ensemble also records the trajectories, births and deaths of individual animals
+# in 'tracking_<i>' next to its population dynamics file (see 'ecol_1_tracking.py').
+# With engine = 'batched', consecutive replicates are advanced together in one BatchedEnvironment (see
+# 'ecol_1_model_vectorized.py'), which is much faster per replicate, and still written to one file per replicate.
+# 'run_adaptive_sweep' runs the replicates of a sweep in rounds and gives every new round to the points whose extinction
+# rate and mean population are least precise, until every point reaches the target precision or the budget is spent.
+# On Windows, calls with more than one worker must be placed under "if __name__ == '__main__':".
+
+#------------------------------------------------------------------------------
+
+# IMPORTS
+import os
+import time
+import heapq
+import numpy as np
+import pandas as pd
+from statistics import mean
+from dataclasses import replace
+from concurrent.futures import ProcessPoolExecutor
+import ecol_1_model as model
+import ecol_1_model_vectorized as vectorized
+from ecol_1_tracking import AgentTracker
+import ecol_2_data_transformation as transformation
+import ecol_3_data_analysis as analysis
+
+#------------------------------------------------------------------------------
+
+# HELPER FUNCTIONS
+
+# Function that returns the independent seed sequence of one replicate, derived from the root seed
+def replicate_seed(root_seed, replicate):
+    return np.random.SeedSequence(root_seed, spawn_key = (replicate,))
+
+
+# Function that returns the output folder of a scenario, following the folder structure used in 'ecol_2_data_transformation.py'
+def output_folder(output_path, scenario, version, logging_intensity):
+
+    if scenario == 'deer_only':
+        return output_path + '/deer_only/v' + str(version)
+    else:
+        return output_path + '/' + scenario + '/v' + str(version) + '/' + str(logging_intensity)
+
+
+# Function that returns the model parameters that differ in a scenario (to be applied with dataclasses.replace)
+def scenario_parameters(scenario, logging_intensity):
+
+    if scenario not in ['logging_intensity', 'protection', 'deer_only']:
+        raise ValueError("scenario must be 'logging_intensity', 'protection' or 'deer_only'")
+
+    parameters = {'no_cells_logged_per_month': logging_intensity}
+
+    # Deer absent predatory pressure
+    if scenario == 'deer_only':
+        parameters['n_wolves'] = 0
+
+    return parameters
+
+
+# Function that raises an error for engine names other than those of the runner
+def check_engine(engine):
+
+    if engine not in ['object', 'vectorized', 'batched']:
+        raise ValueError("engine must be 'object', 'vectorized' or 'batched'")
+
+
+#------------------------------------------------------------------------------
+
+# RUNNER
+
+def new_environment(engine, policy_in_effect, config, streams = model.global_streams):
+
+    # By default, the environment draws from the global generators.
+    # The batched engine takes a list with the streams of every replicate of the batch.
+    check_engine(engine)
+
+    if engine == 'batched':
+        return vectorized.BatchedEnvironment(policy_in_effect = policy_in_effect, n_replicates = len(streams), config = config, streams = streams)
+    elif engine == 'vectorized':
+        return vectorized.VectorizedEnvironment(policy_in_effect = policy_in_effect, config = config, streams = streams)
+    else:
+        return model.Environment(policy_in_effect = policy_in_effect, config = config, streams = streams)
+
+
+def export_pop_dynam(environment, folder, replicates):
+
+    # Writes the population dynamics of every replicate of the environment (the replicates of a batch, in their order)
+    # and returns the paths. Without an output folder, the population dynamics are returned to be collected in a result store
+    if isinstance(environment, vectorized.BatchedEnvironment):
+        if folder is None:
+            return [environment.get_pop_dynam(replicate) for replicate in range(environment.n_replicates)]
+        environment.save_pop_dynam(folder, first_simulation = replicates[0])
+        return [folder + '/pop_dynam_' + str(replicate) + '.csv' for replicate in replicates]
+
+    if folder is None:
+        return [environment.pop_dynam]
+
+    path = folder + '/pop_dynam_' + str(replicates[0]) + '.csv'
+    model.pop_dynam_to_csv(environment.pop_dynam, path, environment.config)
+
+    return [path]
+
+
+def run_replicate(task):
+
+    # Runs the replicates of the task (one, or a batch of consecutive replicates with the batched engine) in every branch
+    # (scenario and logging intensity) and writes their population dynamics. Returns the results by branch and replicate.
+    # With several branches, the days before logging starts are simulated once and every branch continues from a snapshot.
+    # Takes a dictionary so that it can be sent to worker processes.
+    streams = [model.replicate_streams(replicate_seed(task['root_seed'], replicate), task['paired']) for replicate in task['replicates']]
+
+    branches = task['branches']
+    environment = new_environment(task['engine'], branches[0]['policy_in_effect'], branches[0]['config'],
+                                  streams if task['engine'] == 'batched' else streams[0])
+
+    if len(branches) == 1:
+        if task['tracking'] is None:
+            environment.simulation()
+        else:
+            with AgentTracker(branches[0]['folder'] + '/tracking_' + str(task['replicates'][0]), **task['tracking']) as tracker:
+                environment.simulation(tracker = tracker)
+        return [export_pop_dynam(environment, branches[0]['folder'], task['replicates'])]
+
+    environment.simulation(until = branches[0]['config'].start_of_logging - 1)
+    snapshot = model.take_snapshot(environment)
+
+    results = []
+    for branch in branches:
+        environment = model.restore_snapshot(snapshot, branch['policy_in_effect'], branch['config'])
+        environment.simulation()
+        results.append(export_pop_dynam(environment, branch['folder'], task['replicates']))
+
+    return results
+
+
+def collect_results(results, tasks, store):
+
+    # Returns the paths of the written files, or appends the population dynamics to the store as they arrive
+    # (returns the keys of the stored simulations)
+    collected = []
+
+    for task, task_results in zip(tasks, results):
+        for branch, branch_results in zip(task['branches'], task_results):
+            for replicate, result in zip(task['replicates'], branch_results):
+                if store is None:
+                    collected.append(result)
+                else:
+                    store.add(result, **branch['keys'], replicate = replicate)
+                    collected.append(dict(branch['keys'], replicate = replicate))
+
+    return collected
+
+
+def batch_tasks(tasks, batch_size):
+
+    # With the batched engine, joins consecutive tasks with the same branches and consecutive replicates into batches
+    # of up to batch_size replicates that are advanced together in one BatchedEnvironment. Every replicate keeps its
+    # own streams, so the results do not depend on the batch size.
+    if not tasks or tasks[0]['engine'] != 'batched':
+        return tasks
+
+    batches = []
+    for task in tasks:
+        last = batches[-1] if batches else None
+        if (last is not None and len(last['replicates']) < batch_size and last['replicates'][-1] + 1 == task['replicates'][0]
+                and [branch['keys'] for branch in last['branches']] == [branch['keys'] for branch in task['branches']]):
+            last['replicates'] = last['replicates'] + task['replicates']
+        else:
+            batches.append(dict(task))
+
+    return batches
+
+
+def run_tasks(tasks, n_workers, store):
+
+    if n_workers == 1:
+        return collect_results(map(run_replicate, tasks), tasks, store)
+
+    # Hands out the replicates (or batches) one by one to the workers
+    with ProcessPoolExecutor(max_workers = n_workers) as pool:
+        return collect_results(pool.map(run_replicate, tasks, chunksize = 1), tasks, store)
+
+
+def scenario_branch(scenario, logging_intensity, policy_in_effect, version, output_path, config, store):
+
+    # Returns the settings of one scenario and logging intensity within a task
+    if policy_in_effect is None:
+        policy_in_effect = scenario == 'protection'
+
+    if store is None:
+        folder = output_folder(output_path, scenario, version, logging_intensity)
+        os.makedirs(folder, exist_ok = True)
+    else:
+        folder = None
+
+    return {'config': replace(config, **scenario_parameters(scenario, logging_intensity)),
+            'policy_in_effect': policy_in_effect,
+            'folder': folder,
+            'keys': {'scenario': scenario, 'parameter': logging_intensity, 'version': version}}
+
+
+def run_ensemble(scenario, logging_intensity, n_simulations, root_seed, policy_in_effect = None, version = 1,
+                 output_path = 'output', n_workers = None, engine = 'object', config = model.default_config, store = None,
+                 paired = False, tracking = None, batch_size = 32):
+
+    # This is a function that runs a set of simulations for one scenario and logging intensity and exports
+    # one population dynamics file per simulation (pop_dynam_1.csv to pop_dynam_<n_simulations>.csv).
+    # Input one of three scenarios:
+    # 1. logging_intensity (i.e. unprotected forest),
+    # 2. protection (i.e. protected forest),
+    # 3. deer_only (deer absent predatory pressure under unprotected logging)
+    # The policy follows the scenario unless it is given explicitly.
+    # n_workers is the number of worker processes (all cores if None, no pool if 1), engine is 'object', 'vectorized' or
+    # 'batched'. The batched engine advances batch_size replicates at once in a BatchedEnvironment and still writes
+    # one file per replicate, with the same results as the vectorized engine.
+    # config holds the remaining parameters, the scenario and logging intensity are applied on top of it.
+    # With a store (an open ResultWriter from 'ecol_1_results.py'), the results are appended to it instead of written to
+    # one file per simulation, and the keys of the stored simulations are returned.
+    # With paired, every replicate uses the random number streams of its number, so that runs of different scenarios
+    # with the same root seed are paired replicate by replicate.
+    # tracking holds the options of an AgentTracker (e.g. {'every': 30, 'fraction': 0.1}) to record individual animals
+    # in every replicate, which needs the output folders (no store).
+
+    check_engine(engine)
+    if tracking is not None and store is not None:
+        raise ValueError('tracking writes into the output folders and cannot be combined with a store')
+    if tracking is not None and engine == 'batched':
+        raise ValueError('tracking writes one folder per replicate and cannot be combined with the batched engine')
+
+    branch = scenario_branch(scenario, logging_intensity, policy_in_effect, version, output_path, config, store)
+
+    tasks = [{'branches': [branch],
+              'root_seed': root_seed,
+              'replicates': [i],
+              'engine': engine,
+              'paired': paired,
+              'tracking': tracking} for i in range(1, n_simulations + 1)]
+
+    return run_tasks(batch_tasks(tasks, batch_size), n_workers, store)
+
+
+def run_sweep(points, n_simulations, root_seed, version = 1, output_path = 'output', n_workers = None,
+              engine = 'object', config = model.default_config, store = None, paired = False, batch_size = 32):
+
+    # This is a function that runs a set of simulations for several scenarios and logging intensities at once,
+    # given as a list of (scenario, logging_intensity) pairs, e.g. [('logging_intensity', 0), ('protection', 1)].
+    # Every replicate simulates the days before logging starts once for all points that only differ in logging
+    # intensity and policy, and continues into each of them from a snapshot. The output is the same as from
+    # run_ensemble for every point with the same root seed. The other arguments are as in run_ensemble.
+
+    check_engine(engine)
+
+    # Points that share the same burn-in (deer_only has no wolves, so it needs its own)
+    groups = {}
+    for scenario, logging_intensity in points:
+        branch = scenario_branch(scenario, logging_intensity, None, version, output_path, config, store)
+        burn_in = replace(branch['config'], no_cells_logged_per_month = config.no_cells_logged_per_month)
+        groups.setdefault(burn_in, []).append(branch)
+
+    tasks = [{'branches': branches,
+              'root_seed': root_seed,
+              'replicates': [i],
+              'engine': engine,
+              'paired': paired,
+              'tracking': None} for branches in groups.values() for i in range(1, n_simulations + 1)]
+
+    return run_tasks(batch_tasks(tasks, batch_size), n_workers, store)
+
+
+#------------------------------------------------------------------------------
+
+# ADAPTIVE SWEEPS
+
+# The extinction rate is only uncertain in the transition zone between logging intensities at which the wolves always
+# survive and those at which they always go extinct. An adaptive sweep starts every point with a few replicates and
+# then runs further rounds, each allocated replicate by replicate to the point with the widest confidence interval
+# relative to its target (the projected width shrinks with the square root of the number of replicates).
+# Only what the estimates need is kept per replicate: whether the population went extinct and its mean size from
+# post_eq_time on, taken from the new files of every round with 'extinction_flags' and 'column_means' in
+# 'ecol_3_data_analysis.py'. The estimates are those of 'calculate_extinction_rate' and 'calculate_mean_pop_size',
+# so that the sweep stops on the same numbers as the analysis, but the wide data set of a point is never held in memory.
+# Replicates are numbered from 1 at every point and drawn from the same root seed, so a point with n replicates
+# holds the same simulations as run_ensemble with n_simulations = n, and its files can be merged with
+# 'ecol_2_data_transformation.py' as usual (with the number of simulations of that point).
+
+# Function that returns the Wilson score interval of a proportion (in %), which stays within 0% and 100% and
+# keeps a width at extinction rates of 0% and 100% that shrinks with the number of simulations
+def wilson_interval(successes, n, z = 1.96):
+
+    proportion = successes/n
+    denominator = 1 + z**2/n
+    centre = (proportion + z**2/(2*n))/denominator
+    half_width = z*np.sqrt(proportion*(1 - proportion)/n + z**2/(4*n**2))/denominator
+
+    return 100*max(centre - half_width, 0), 100*min(centre + half_width, 1)
+
+
+# Function that returns the normal confidence interval of a mean (infinitely wide with fewer than two values)
+def mean_interval(values, z = 1.96):
+
+    if len(values) < 2:
+        return -np.inf, np.inf
+
+    half_width = z*np.std(values, ddof = 1)/np.sqrt(len(values))
+
+    return np.mean(values) - half_width, np.mean(values) + half_width
+
+
+def replicate_summaries(paths, animal, cutoff, n_workers = None):
+
+    # Returns the extinction flags and the mean population sizes from the cutoff on of an animal ('Deer' or 'Wolves')
+    # in a batch of replicate files (the wide-format data set of the batch is dropped afterwards)
+    data = transformation.merge_pop_dynam(paths, [str(i) for i in range(1, len(paths) + 1)], n_workers)
+    n = data.filter(regex = 'n_'+animal)
+
+    return analysis.extinction_flags(n.to_numpy()), analysis.column_means(n.loc[data.timestep >= cutoff].to_numpy())
+
+
+def point_estimates(flags, means, z = 1.96):
+
+    # Returns the extinction rate and mean population size at one point with their confidence intervals,
+    # from the extinction flags and mean population sizes of its simulations
+    n_simulations = len(flags)
+    extinctions = int(flags.sum())
+    extinction_low, extinction_high = wilson_interval(extinctions, n_simulations, z)
+    population_low, population_high = mean_interval(means, z)
+
+    return {'n_simulations': n_simulations,
+            'extinction_rate': round((extinctions/n_simulations)*100,1),
+            'extinction_rate_low': extinction_low,
+            'extinction_rate_high': extinction_high,
+            'mean_pop_size': mean(means),
+            'mean_pop_size_low': population_low,
+            'mean_pop_size_high': population_high}
+
+
+def relative_width(estimates, target_extinction, target_population):
+
+    # Widest confidence half-width of a point relative to its target (at most 1 once the point is precise enough)
+    return max((estimates['extinction_rate_high'] - estimates['extinction_rate_low'])/2/target_extinction,
+               (estimates['mean_pop_size_high'] - estimates['mean_pop_size_low'])/2/target_population)
+
+
+def allocate_round(widths, counts, round_size, max_replicates):
+
+    # Hands out the replicates of the next round one by one to the point with the widest projected interval,
+    # skipping points that are precise enough or have reached max_replicates (ties go to the first point)
+    allocation = {}
+    queue = [(-width, index, point) for index, (point, width) in enumerate(widths.items())
+             if width > 1 and counts[point] < max_replicates]
+    heapq.heapify(queue)
+
+    for i in range(round_size):
+        if not queue:
+            break
+        width, index, point = heapq.heappop(queue)
+        allocation[point] = allocation.get(point, 0) + 1
+        n = counts[point] + allocation[point]
+        projected = widths[point]*np.sqrt(counts[point]/n)
+        if n < max_replicates and projected > 1:
+            heapq.heappush(queue, (-projected, index, point))
+
+    return allocation
+
+
+def run_round(allocation, counts, root_seed, version, output_path, n_workers, engine, config, paired, batch_size):
+
+    # Runs the next replicates of every point in the allocation and returns the paths of their files by point.
+    # Points that run the same replicate share its burn-in, as in run_sweep.
+    tasks = {}
+    for (scenario, logging_intensity), n_new in allocation.items():
+        branch = scenario_branch(scenario, logging_intensity, None, version, output_path, config, None)
+        burn_in = replace(branch['config'], no_cells_logged_per_month = config.no_cells_logged_per_month)
+        for i in range(counts[(scenario, logging_intensity)] + 1, counts[(scenario, logging_intensity)] + n_new + 1):
+            tasks.setdefault((burn_in, i), []).append(branch)
+
+    tasks = batch_tasks([{'branches': branches,
+                          'root_seed': root_seed,
+                          'replicates': [i],
+                          'engine': engine,
+                          'paired': paired,
+                          'tracking': None} for (burn_in, i), branches in tasks.items()], batch_size)
+
+    paths = iter(run_tasks(tasks, n_workers, None))
+    results = {}
+    for task in tasks:
+        for branch in task['branches']:
+            for replicate in task['replicates']:
+                results.setdefault((branch['keys']['scenario'], branch['keys']['parameter']), []).append(next(paths))
+
+    return results
+
+
+def run_adaptive_sweep(points, root_seed, target_extinction = 5, target_population = 1, initial_replicates = 20,
+                       round_size = 200, max_replicates = 1000, budget = None, animal = 'Wolves', post_eq_time = 4000,
+                       version = 1, output_path = 'output', n_workers = None, engine = 'object',
+                       config = model.default_config, paired = False, batch_size = 32):
+
+    # This is a function that runs a sweep over (scenario, logging_intensity) points as in run_sweep, but with a
+    # number of simulations per point that follows the uncertainty of its results. Every point starts with
+    # initial_replicates simulations. After every round, the extinction rate (Wilson interval, in %) and the mean
+    # population size from post_eq_time on (normal interval) of the animal are estimated for every point, and the
+    # next round of round_size simulations goes to the points with the widest 95% intervals. A point is finished
+    # once both half-widths are within their targets (target_extinction in percentage points, target_population
+    # in animals) or it has max_replicates simulations. The sweep stops when all points are finished or when
+    # budget simulations have been run in total.
+    # Returns one row of estimates per round and point; the last round of every point holds its final estimates.
+    # The other arguments are as in run_sweep. The files are written as by run_ensemble.
+
+    check_engine(engine)
+    if initial_replicates < 2:
+        raise ValueError('initial_replicates must be at least 2')
+
+    points = list(points)
+    counts = {point: 0 for point in points}
+    flags = {point: np.zeros(0, dtype = bool) for point in points}
+    means = {point: [] for point in points}
+    widths = {}
+    budget = len(points)*max_replicates if budget is None else budget
+    allocation = {point: min(initial_replicates, max_replicates) for point in points}
+
+    if sum(allocation.values()) > budget:
+        raise ValueError('budget must cover the initial replicates of all points')
+    history = []
+    round_number = 0
+
+    while allocation and sum(counts.values()) + sum(allocation.values()) <= budget:
+
+        round_number += 1
+        results = run_round(allocation, counts, root_seed, version, output_path, n_workers, engine, config, paired, batch_size)
+
+        # Only the points with new simulations are estimated again, from the summaries of their new files
+        for point in points:
+            if point not in results:
+                continue
+            new_flags, new_means = replicate_summaries(results[point], animal, post_eq_time, n_workers)
+            flags[point] = np.concatenate([flags[point], new_flags])
+            means[point] += new_means
+            counts[point] += len(results[point])
+            estimates = point_estimates(flags[point], means[point])
+            widths[point] = relative_width(estimates, target_extinction, target_population)
+            history.append(dict({'round': round_number, 'scenario': point[0], 'logging_intensity': point[1]},
+                                **estimates, relative_width = widths[point]))
+
+        allocation = allocate_round(widths, counts, min(round_size, budget - sum(counts.values())), max_replicates)
+
+    return pd.DataFrame(history)
+
+
+#------------------------------------------------------------------------------
+
+# EXECUTE
+
+if __name__ == '__main__':
+
+    start_time = time.time()
+
+    # Deer only
+    # run_ensemble(scenario = 'deer_only', logging_intensity = 8, n_simulations = 100, root_seed = 1, version = 1)
+
+    # Scattered logging with 10% of the animals tracked once a month
+    # run_ensemble(scenario = 'logging_intensity', logging_intensity = 7, n_simulations = 100, root_seed = 1, version = 3,
+    #              tracking = {'every': 30, 'fraction': 0.1})
+
+    # Scattered and targeted logging at one intensity, paired replicate by replicate
+    # run_sweep([('logging_intensity', 7), ('protection', 7)], n_simulations = 100, root_seed = 1, version = 2, paired = True)
+
+    # Logging intensities without and with protection from one burn-in per replicate
+    # points = [('logging_intensity', i) for i in range(0, 14)] + [('protection', i) for i in range(1, 13)]
+    # run_sweep(points, n_simulations = 1000, root_seed = 1, version = 1)
+
+    # Logging intensities without and with protection, with more simulations where the extinction rate is uncertain
+    # estimates = run_adaptive_sweep(points, root_seed = 1, version = 3, target_extinction = 2.5)
+    # print(estimates.groupby(['scenario', 'logging_intensity']).last())
+
+    # Logging intensities without and with protection, collected in one result file
+    # from ecol_1_results import ResultWriter
+    # with ResultWriter('output/sweep_v1.parquet') as store:
+    #     for i in range(0, 14):
+    #         run_ensemble(scenario = 'logging_intensity', logging_intensity = i, n_simulations = 1000, root_seed = 1, version = 1, store = store)
+    #     for i in range(1, 13):
+    #         run_ensemble(scenario = 'protection', logging_intensity = i, n_simulations = 1000, root_seed = 1, version = 1, store = store)
+
+    # Logging intensities without and with protection, one file per simulation
+    # for i in range(0, 14):
+    #     run_ensemble(scenario = 'logging_intensity', logging_intensity = i, n_simulations = 1000, root_seed = 1, version = 1)
+    # for i in range(1, 13):
+    #     run_ensemble(scenario = 'protection', logging_intensity = i, n_simulations = 1000, root_seed = 1, version = 1)
+
+    print('Program finished in ', time.time() - start_time, 'seconds.' )
@@ -4,144 +4,537 @@
 # Python version: 3.9.13
 # Last update: 22/07/23
 
-# Note: The model includes additional tracking options, which are commented out. 
-# They slow down the model but are helpful for checking the dynamics of individual animals if necessary.
-# Multi-processing-oriented code for big sets of simulations is commented out at the bottom.
+# Note: The positions, fitness, births and deaths of individual animals can be recorded with an AgentTracker
+# (see 'ecol_1_tracking.py'), which is helpful for checking the dynamics of individual animals if necessary.
+# Big sets of simulations are run in parallel with the runner in 'ecol_1_ensemble.py'.
 
 #------------------------------------------------------------------------------
 
 # IMPORTS AND OPTIONS
 import time
+import copy
+import json
 import numpy as np
 import random as rd
 import math as mt
 import pandas as pd
 import matplotlib.pyplot as plt
 from statistics import mean
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from ecol_1_tracking import no_tracker
 
 #------------------------------------------------------------------------------
 
 # PARAMETER INITIALIZATIONS
-years = 15
-length_year = 360
-timesteps = int(length_year*years)
-beginning_of_winter = int(0.75*length_year)
-month_ticks = list(range(1,beginning_of_winter+1,30))
-landscape_size = 11 
-no_cells_logged_per_month = 6
-start_of_logging  = 5*length_year
-stop_of_logging = 6*length_year
-n_deers = 180
-n_wolves = 10
-initial_fitness_deer = 30
-initial_fitness_wolf = 50
-fitness_loss_deer = 1
-fitness_loss_wolves = 1
-old_growth_base_nutrition = 4
-end_of_seral_forest = 4*length_year
-new_growth_base_nutrition = 1
-summer_food_factor_old_growth = 1
-summer_food_factor_new_growth = 1
-winter_food_factor_old_growth = 0.9
-winter_food_factor_new_growth = 0.5
-max_food_gain_deer = 2
-gain_from_deer = 12
-predation_efficiency = 0.16
-hunt_refresh_time = 7
-wolf_birth_threshold = 100
-wolf_birth_loss = 50
-deer_birth_threshold = 60
-deer_birth_loss = 30
+
+# All parameters are held in an immutable ModelConfig that the environment, the animals and the helper functions read from.
+# The defaults are the parameters of the paper. Variations are created with dataclasses.replace, 
+# e.g. replace(default_config, no_cells_logged_per_month = 8), so that sweeps can run in one process.
+
+@dataclass(frozen = True)
+class ModelConfig:
+    years: int = 15
+    length_year: int = 360
+    landscape_size: int = 11 
+    no_cells_logged_per_month: int = 6
+    start_of_logging: int = 5*360
+    stop_of_logging: int = 6*360
+    n_deers: int = 180
+    n_wolves: int = 10
+    initial_fitness_deer: float = 30
+    initial_fitness_wolf: float = 50
+    fitness_loss_deer: float = 1
+    fitness_loss_wolves: float = 1
+    old_growth_base_nutrition: float = 4
+    end_of_seral_forest: int = 4*360
+    new_growth_base_nutrition: float = 1
+    summer_food_factor_old_growth: float = 1
+    summer_food_factor_new_growth: float = 1
+    winter_food_factor_old_growth: float = 0.9
+    winter_food_factor_new_growth: float = 0.5
+    max_food_gain_deer: float = 2
+    gain_from_deer: float = 12
+    predation_efficiency: float = 0.16
+    hunt_refresh_time: int = 7
+    wolf_birth_threshold: float = 100
+    wolf_birth_loss: float = 50
+    deer_birth_threshold: float = 60
+    deer_birth_loss: float = 30
+    # Set to True to reproduce the original removal of dead animals, which skipped the animal after each removed one that day.
+    # With the default random numbers, a seeded run of 'Environment' then gives the same output as the original model.
+    legacy_removal: bool = False
+    
+    # Derived parameters
+    @property
+    def timesteps(self):
+        return int(self.length_year*self.years)
+    
+    @property
+    def beginning_of_winter(self):
+        return int(0.75*self.length_year)
+    
+    @property
+    def month_ticks(self):
+        return list(range(1,self.beginning_of_winter+1,30))
+
+
+default_config = ModelConfig()
+
+
+# RANDOM NUMBER STREAMS
+
+# Every random draw of the model serves one purpose: the initial positions of the animals, the cells that are logged
+# or the outcome of wolf-deer encounters (movement is deterministic). Both engines draw through the same batched
+# methods (positions, flat_positions, sample, first_successes), which are provided by two kinds of streams:
+# GlobalRandom draws from the global generators ('random' and numpy) exactly as the original model did, and is the default.
+# GeneratorRandom draws from a numpy Generator owned by the environment. 'replicate_streams' seeds it from the
+# SeedSequence of a replicate, so that a run is reproduced bit for bit from its root seed and replicate number,
+# whatever process or batch it runs in. For paired comparisons, every purpose gets its own Generator, so that both
+# arms of a replicate start with the same animals and the draws for one purpose do not shift the draws for the others
+# when the arms log differently.
+
+class GlobalRandom:
+    
+    # Draws from the global generators in the same order as the original engines
+    
+    def positions(self, n, landscape_size):
+        # (x, y) positions, drawn animal by animal from 'random' (object-based engine)
+        return [(rd.randint(0,landscape_size-1), rd.randint(0,landscape_size-1)) for i in range(n)]
+    
+    def skip_positions(self, n, landscape_size):
+        # The original model drew a random position for every newborn before placing it with its parent
+        self.positions(n, landscape_size)
+    
+    def flat_positions(self, n, landscape_size):
+        # Flat positions (x*landscape_size + y) drawn from numpy (vectorized engine)
+        return np.random.randint(0, landscape_size, n)*landscape_size + np.random.randint(0, landscape_size, n)
+    
+    def sample(self, population, k):
+        return rd.sample(population, k)
+    
+    def first_successes(self, p, counts):
+        # For every wolf, the encounters are drawn one at a time until the first success, as in the original model.
+        # Returns the index of the first successful encounter of every wolf, -1 if none succeeds.
+        first = np.full(len(counts), -1)
+        for i, n in enumerate(counts):
+            for k in range(n):
+                if np.random.binomial(1, p, 1) == 1:
+                    first[i] = k
+                    break
+        return first
+
+
+class GeneratorRandom:
+    
+    # Draws from a numpy Generator in batches. Both engines get the same initial positions from the same Generator.
+    
+    def __init__(self, generator):
+        self.generator = generator
+    
+    def positions(self, n, landscape_size):
+        return list(map(tuple, self.generator.integers(0, landscape_size, (n, 2)).tolist()))
+    
+    def skip_positions(self, n, landscape_size):
+        pass
+    
+    def flat_positions(self, n, landscape_size):
+        xy = self.generator.integers(0, landscape_size, (n, 2))
+        return xy[:, 0]*landscape_size + xy[:, 1]
+    
+    def sample(self, population, k):
+        if k > len(population):
+            raise ValueError('Sample larger than population')
+        return [population[i] for i in self.generator.choice(len(population), k, replace = False)]
+    
+    def first_successes(self, p, counts):
+        # One geometric draw (number of trials up to the first success) per wolf with encounters
+        counts = np.asarray(counts, dtype = int)
+        first = np.full(len(counts), -1)
+        if p > 0 and counts.sum() > 0:
+            trials = self.generator.geometric(p, (counts > 0).sum())
+            first[counts > 0] = np.where(trials <= counts[counts > 0], trials - 1, -1)
+        return first
+
+
+global_random = GlobalRandom()
+
+
+@dataclass(frozen = True)
+class RandomStreams:
+    initialization: object = global_random
+    logging: object = global_random
+    predation: object = global_random
+
+global_streams = RandomStreams()
+
+
+# Function that returns the streams of one replicate from its SeedSequence: one Generator for all purposes,
+# or with paired, one Generator per purpose (the same in every scenario).
+# The children of the purposes are derived from the entropy and spawn key of the SeedSequence instead of 'spawn',
+# which would change the SeedSequence and give the next call with the same object other children.
+def replicate_streams(seed_sequence, paired = False):
+    
+    if paired:
+        children = [np.random.SeedSequence(seed_sequence.entropy, spawn_key = seed_sequence.spawn_key + (i,)) for i in range(3)]
+        return RandomStreams(*(GeneratorRandom(np.random.default_rng(seed)) for seed in children))
+    
+    stream = GeneratorRandom(np.random.default_rng(seed_sequence))
+    return RandomStreams(stream, stream, stream)
 
 
 #------------------------------------------------------------------------------
 
 # HELPER FUNCTIONS AND OBJECTS
 
-# Landscape for first initialization
-mock_landscape = np.zeros((landscape_size,landscape_size))
+# Function that returns the cells within a radius around a position (the square clipped to the landscape, without
+# the position itself), row by row
+def clipped_range(position, radius, landscape_size):
+    x, y = position
+    return [(i, j) for i in range(max(x - radius, 0), min(x + radius, landscape_size - 1) + 1)
+            for j in range(max(y - radius, 0), min(y + radius, landscape_size - 1) + 1) if (i, j) != (x, y)]
+
+
+# Function for biomass growth in seral forests
+def biomass_growth(forest_age, config):
+    return np.log(forest_age + 1) + config.old_growth_base_nutrition
+
 
+# Function that counts the number of deer in every cell in one pass over the flat positions (x*landscape_size + y)
+def occupancy_grid(flat_positions, config):
+    return np.bincount(flat_positions, minlength = config.landscape_size**2).reshape((config.landscape_size,config.landscape_size))
 
-# Function to return a list of nxn cells around a given cell
-def range_finder(matrix, position, radius):
-    adj = []
+
+# Function that updates the nutrition of all cells with deer presence at once, given the number of deer per cell
+def update_nutrition(landscape, landscape_history, landscape_nutrition, deer_in_cell, config):
     
-    lower = 0 - radius
-    upper = 1 + radius
+    # Forest types: old-growth, seral new-growth and closed canopy new-growth
+    old_growth = landscape == 0
+    seral = ~old_growth & (landscape_history < config.end_of_seral_forest)
+    closed_canopy = ~old_growth & (landscape_history >= config.end_of_seral_forest)
     
-    for dx in range(lower, upper):
-        for dy in range(lower, upper):
-            rangeX = range(0, matrix.shape[0])  # Identifies X bounds
-            rangeY = range(0, matrix.shape[1])  # Identifies Y bounds
-            
-            (newX, newY) = (position[0]+dx, position[1]+dy)  # Identifies adjacent cell
-            
-            if (newX in rangeX) and (newY in rangeY) and (dx, dy) != (0, 0):
-                adj.append((newX, newY))
+    # Base nutrition depending on forest type, with marginally decreasing growth in the seral period
+    nutrition = np.where(old_growth, config.old_growth_base_nutrition,
+                         np.where(seral, biomass_growth(landscape_history, config), config.new_growth_base_nutrition))
     
-    return adj
+    # For cells with deer presence, divide by the number of deer in the cell (other cells are left as they are)
+    update = (deer_in_cell > 0) & (old_growth | seral | closed_canopy)
+    landscape_nutrition[update] = nutrition[update]/deer_in_cell[update]
 
 
-# Nested dictionary that contains all sets of neighbors for all possible distances up to half the landscape size
-neighbor_dict = {d: {(i,j): range_finder(mock_landscape, (i,j), d)
-                     for i in range(landscape_size) for j in range(landscape_size)}
-                 for d in range(1,landscape_size)}
+# Function that returns the home range around an origin as a tuple of cell ids (x*landscape_size + y): the cells within
+# the radius, followed by the origin. Home ranges are immutable and interned, so all animals with the same origin
+# and radius share one object.
+@lru_cache(maxsize = None)
+def home_range_cells(origin, radius, landscape_size):
+    return tuple(x*landscape_size + y for x, y in clipped_range(origin, radius, landscape_size)) + (origin[0]*landscape_size + origin[1],)
 
 
+# Function that sets up the spatial memory of an animal. The memory maps the cell ids of the home range to the timestep
+# at which the cell was last visited (-inf if never visited), cells outside the home range are missing
+def spatial_memory(home_range, position, timestep, config):
+    memory = dict.fromkeys(home_range, -float('inf'))
+    memory[position[0]*config.landscape_size + position[1]] = timestep
+    return memory
 
 
-# Function for biomass growth in seral forests
-def biomass_growth(forest_age):
-    return np.log(forest_age + 1) + old_growth_base_nutrition
+# Function that returns the cells adjacent to a position as (cell id, cell) pairs, in the order of 'clipped_range'
+@lru_cache(maxsize = None)
+def adjacent_cells(position, landscape_size):
+    return tuple((x*landscape_size + y, (x, y)) for x, y in clipped_range(position, 1, landscape_size))
 
 
 # Function that picks the cell in the home range that was visited longest ago
-def cell_choice(position, home_range, memory):
-    # These are all the adjacent cells to the current position
-    adjacent_cells = neighbor_dict[1][position].copy()
-    # This is the subset of cells of the adjacent cells belonging to homerange
-    possible_choices = [i for i in adjacent_cells if i in home_range]
-    # This yields the "master" indeces of those choices
-    indeces = []
-    for i in possible_choices:
-        indeces.append(home_range.index(i))
-    # This picks the index with the maximum value in the memory (ie visited longest ago)
-    memory_values = [memory[i] for i in indeces]
-    pick_index = indeces[memory_values.index(max(memory_values))]
-    # Sets that values memory to zero
-    memory[pick_index] = 0
-    # Adds one period to every other index
-    other_indeces = [i for i in list(range(len(memory))) if i != pick_index]
-    for i in other_indeces:
-        memory[i] += 1
+def cell_choice(position, memory, timestep, config):
+    # Goes through the adjacent cells to the current position and keeps the one in the home range
+    # with the earliest last visit (the first one in case of ties)
+    pick = None
+    last_visits = memory.get
+    for cell_id, cell in adjacent_cells(position, config.landscape_size):
+        last_visit = last_visits(cell_id)
+        if last_visit is not None and (pick is None or last_visit < earliest_visit):
+            pick = cell
+            pick_id = cell_id
+            earliest_visit = last_visit
+    # Registers the visit
+    memory[pick_id] = timestep
     # Returns the picked cell
-    return home_range[pick_index]
+    return pick
+
+
+# Function that returns the protected block (1 = protected) for a given policy
+def build_protected_zone(policy_in_effect, config):
+    
+    landscape_size = config.landscape_size
+    protected_zone = np.zeros((landscape_size,landscape_size))
+    
+    # If a policy is in place, protect the block
+    if policy_in_effect:
+        
+        indeces_to_protect = []
+        
+        number_of_columns_reserved_for_protection = landscape_size - mt.ceil(config.no_cells_logged_per_month*9/landscape_size)
+        
+        for i in range(landscape_size):
+            for j in range(number_of_columns_reserved_for_protection):
+                indeces_to_protect.append((i,j))
+        
+        for i in indeces_to_protect:
+            protected_zone[i[0],i[1]] = 1
+            
+    return protected_zone
+
+
+# Function that decreases the fitness of every animal in a list and returns the surviving animals in one pass.
+# With legacy_removal, the animal following a removed one is skipped (neither aged nor removed), as in the original list removal.
+# The running totals of the species are updated on the way: the home ranges of the removed animals are subtracted.
+def age_and_remove(animals, fitness_loss, legacy_removal, totals):
+    
+    survivors = []
+    skip = False
+    
+    for animal in animals:
+        
+        if skip:
+            survivors.append(animal)
+            skip = False
+            continue
+        
+        # Decreases fitness linearly
+        aged = animal.fitness - fitness_loss
+        animal.fitness = aged
+        
+        if aged > 0:
+            survivors.append(animal)
+        else:
+            totals.home_range -= len(animal.home_range)
+            skip = legacy_removal
+    
+    totals.count = len(survivors)
+            
+    return survivors
+
 
+# Function that returns the animals of a list that are missing from the survivors (in the order of the list)
+def removed_animals(animals, survivors):
+    
+    surviving = set(map(id, survivors))
+    
+    return [animal for animal in animals if id(animal) not in surviving]
 
-# Function to calculate average home range size per timestep
+
+# Function to calculate average home range size per timestep ('Deer' or 'Wolf'), from the running totals of the environment
 def avg_hr_size(environment, animal):
     
-    sum_hr = 0
+    totals = environment.totals[animal]
+    
+    if totals.count > 0:
+        return totals.home_range/totals.count
+    else: 
+        return 0
+        
+        
+
+#------------------------------------------------------------------------------
+
+# DATA COLLECTION
+
+class PopulationTotals:
+    
+    # Running totals of one species: the number of animals and the sum of their home range sizes.
+    # They are updated where they change instead of summing over all animals for every record: home ranges on births,
+    # deaths and home range expansions, the number of animals in the daily aging pass ('age_and_remove').
+    # The average home range size ('avg_hr_size') built on them costs the same for any population size.
+    
+    def __init__(self, animals):
+        
+        self.count = len(animals)
+        self.home_range = sum(len(animal.home_range) for animal in animals)
+        
+        
+    def add(self, animal):
+        
+        self.count += 1
+        self.home_range += len(animal.home_range)
+
+
+
+class TimeSeriesRecorder:
+    
+    # Collects per-timestep metrics in preallocated NumPy arrays with one row per timestep.
+    # Each metric is registered with a name, a function that takes the environment and returns the value, and a dtype.
+    # Recording only writes into the arrays; a DataFrame is only created when the data is requested.
+    # With n_replicates, every row holds one value per replicate (the function then returns an array).
+    
+    def __init__(self, n_rows, n_replicates = None):
+        
+        self.n_rows = n_rows
+        self.n_replicates = n_replicates
+        self.n_recorded = 0
+        self.functions = {}
+        self.columns = {'timestep': np.arange(n_rows)}
+        
+        
+    def add_metric(self, name, function, dtype = float):
+        
+        self.functions[name] = function
+        
+        if self.n_replicates is None:
+            self.columns[name] = np.zeros(self.n_rows, dtype = dtype)
+        else:
+            self.columns[name] = np.zeros((self.n_rows, self.n_replicates), dtype = dtype)
+        
+        
+    def record(self, environment, timestep):
+        
+        for name, function in self.functions.items():
+            self.columns[name][timestep] = function(environment)
+            
+        self.n_recorded = max(self.n_recorded, timestep + 1)
+        
+        
+    def to_frame(self, replicate = None):
+        
+        # Returns all timesteps recorded so far as a DataFrame (for one replicate if the recorder holds several)
+        if self.n_replicates is None:
+            columns = {name: column[:self.n_recorded] for name, column in self.columns.items()}
+        else:
+            columns = {name: column[:self.n_recorded] if name == 'timestep' else column[:self.n_recorded, replicate]
+                       for name, column in self.columns.items()}
+        
+        return pd.DataFrame(columns)
+    
+    
+    def to_csv(self, path, replicate = None):
+        
+        self.to_frame(replicate).to_csv(path, index = False)
+
+
+# Function that sets up the recorder for the population dynamics (numbers of animals and average home range sizes)
+def population_recorder(config):
+    
+    recorder = TimeSeriesRecorder(config.timesteps + 1)
+    recorder.add_metric('n_deer', lambda environment: len(environment.deers), dtype = int)
+    recorder.add_metric('n_wolves', lambda environment: len(environment.wolves), dtype = int)
+    recorder.add_metric('hr_deer', lambda environment: avg_hr_size(environment, 'Deer'))
+    recorder.add_metric('hr_wolves', lambda environment: avg_hr_size(environment, 'Wolf'))
+    
+    return recorder
+
+
+# Function that writes the population dynamics of a run to a .csv file. In runs without wolves (deer-only runs) or
+# without deer, the home range column of the absent species is 0 throughout and written as integers, like the files
+# of the original model, which built the data row by row from the integer 0 returned without animals
+def pop_dynam_to_csv(pop_dynam, path, config):
+    
+    absent = [name for name, n_animals in [('hr_deer', config.n_deers), ('hr_wolves', config.n_wolves)] if n_animals == 0]
+    
+    pop_dynam.astype({name: int for name in absent}).to_csv(path, index = False)
+
+
+#------------------------------------------------------------------------------
+
+# PROFILING
+
+# Phases of a simulated day, in the order in which 'simulation' runs them
+simulation_phases = ['landscape_aging', 'logging', 'move', 'available_food', 'feed', 'predation',
+                     'update_homerange', 'reproduction', 'kill_animals', 'recording']
+
+
+class PhaseProfiler:
+    
+    # Records the wall time and the number of calls of every phase of a simulated day, and the population sizes every
+    # sample_every days. A profiler is passed to 'simulation', which marks the end of every phase with 'lap', so that
+    # the time since the previous lap is added to that phase. With trace, every phase is also kept as an event,
+    # to be written as a Chrome trace (JSON file that can be opened in chrome://tracing or Perfetto).
+    
+    def __init__(self, sample_every = 1, trace = False):
+        
+        self.sample_every = sample_every
+        self.trace = trace
+        self.total_time = {}
+        self.calls = {}
+        self.samples = []
+        self.events = []
+        self.origin = time.perf_counter()
+        self.last = self.origin
+        self.timestep = 0
+        
+        
+    def start_day(self, timestep):
+        
+        self.timestep = timestep
+        self.day_start = self.last = time.perf_counter()
+        
+        
+    def lap(self, phase):
+        
+        now = time.perf_counter()
+        self.total_time[phase] = self.total_time.get(phase, 0) + now - self.last
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        
+        if self.trace:
+            self.events.append((phase, self.last, now - self.last, self.timestep))
+            
+        self.last = now
+        
+        
+    def end_day(self, environment):
+        
+        # Samples the total number of animals (summed over the replicates of a batch) and the wall time of the day
+        if self.timestep % self.sample_every == 0:
+            self.samples.append((self.timestep, len(environment.deers), len(environment.wolves), self.last - self.day_start, self.last))
+            
+            
+    def report(self):
+        
+        # Returns one row per phase (in the order of the day) with the number of calls, the total and mean wall time
+        # in seconds and the share of the total time
+        phases = sorted(self.total_time, key = lambda phase: simulation_phases.index(phase))
+        report = pd.DataFrame({'phase': phases,
+                               'calls': [self.calls[phase] for phase in phases],
+                               'total_time': [self.total_time[phase] for phase in phases]})
+        report['mean_time'] = report.total_time/report.calls
+        report['share'] = report.total_time/report.total_time.sum()
+        
+        return report
+    
+    
+    def population_samples(self):
+        
+        return pd.DataFrame([sample[:4] for sample in self.samples], columns = ['timestep', 'n_deer', 'n_wolves', 'day_time'])
     
-    if animal == 'Deer':
-        for i in range(len(environment.deers)):
-            sum_hr += len(environment.deers[i].home_range)
-       
-        if len(environment.deers) > 0:
-            return sum_hr/len(environment.deers)
-        else: 
-            return 0
     
-    if animal == 'Wolf':
-        for i in range(len(environment.wolves)):
-            sum_hr += len(environment.wolves[i].home_range)
+    def write_trace(self, path):
         
-        if len(environment.wolves) > 0:
-            return sum_hr/len(environment.wolves)
-        else: 
-            return 0
+        # Writes the phases as complete events and the population samples as counters (times in microseconds)
+        if not self.trace:
+            raise ValueError('The profiler was created without trace')
         
+        events = [{'name': phase, 'ph': 'X', 'pid': 0, 'tid': 0, 'ts': (start - self.origin)*1e6, 'dur': duration*1e6,
+                   'args': {'timestep': timestep}} for phase, start, duration, timestep in self.events]
+        events += [{'name': 'population', 'ph': 'C', 'pid': 0, 'tid': 0, 'ts': (end - self.origin)*1e6,
+                    'args': {'n_deer': n_deer, 'n_wolves': n_wolves}} for timestep, n_deer, n_wolves, day_time, end in self.samples]
         
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+class NoProfiler:
+    
+    # Stands in for a PhaseProfiler when a simulation is not profiled, so that marking the phases costs next to nothing
+    
+    def start_day(self, timestep):
+        pass
+    
+    def lap(self, phase):
+        pass
+    
+    def end_day(self, environment):
+        pass
+
+no_profiler = NoProfiler()
+
 
 #------------------------------------------------------------------------------
 
@@ -150,16 +543,17 @@ def avg_hr_size(environment, animal):
 class Deer:
     
     
-    def __init__(self, ID):
+    def __init__(self, ID, config, position, timestep = 0):
         
-        # Assigns individual ID
+        # Assigns individual ID and the parameters
         self.id = ID
+        self.config = config
         
         # Initializes fitness
-        self.fitness = initial_fitness_deer
+        self.fitness = config.initial_fitness_deer
         
-        # Initializes a random position within the landscape 
-        self.position = (rd.randint(0,landscape_size-1),rd.randint(0,landscape_size-1))
+        # Initializes the position within the landscape (random for the first deer, the parent's position for offspring)
+        self.position = position
         self.original_position = self.position
 
         # Sets up a counter how long the deer has been in the cell
@@ -169,12 +563,10 @@ class Deer:
         self.movement_radius = 1
         
         # Defines an initial home range around the position
-        self.home_range = neighbor_dict[self.movement_radius][self.position].copy()
-        self.home_range.append(self.position)
+        self.home_range = home_range_cells(self.position, self.movement_radius, config.landscape_size)
         
-        # Sets up a list of counters how long ago cells in the home range have been visited
-        self.memory = [float('inf')]*len(self.home_range)
-        self.memory[self.home_range.index(self.position)] = 0
+        # Sets up the timesteps at which cells in the home range have last been visited
+        self.memory = spatial_memory(self.home_range, self.position, timestep, self.config)
 
         
         # Defines a feeding counter
@@ -182,28 +574,28 @@ class Deer:
         
     
     
-    def move(self, landscape, landscape_history):
+    def move(self, landscape, landscape_history, timestep):
 
         # Determines movement based on forest type
         # Case 1: Old-growth forest
         if landscape[self.position[0], self.position[1]] == 0:
             # If last two time periods already in this cell, move and reset counter, otherwise stay and increase
             if self.time_spent_in_cell > 2:
-                self.position =  cell_choice(self.position, self.home_range, self.memory)
+                self.position =  cell_choice(self.position, self.memory, timestep, self.config)
                 self.time_spent_in_cell = 1
             else:
                 self.time_spent_in_cell += 1
         # Case 2: New-growth forest
         else:
             # Case 2a: If in seral forest, move immediately
-            if landscape_history[self.position[0], self.position[1]] < end_of_seral_forest:
-                self.position =  cell_choice(self.position, self.home_range, self.memory)
+            if landscape_history[self.position[0], self.position[1]] < self.config.end_of_seral_forest:
+                self.position =  cell_choice(self.position, self.memory, timestep, self.config)
                 self.time_spent_in_cell = 1
             # Case 2b: Closed canopy new-growth
-            elif landscape_history[self.position[0], self.position[1]] >= end_of_seral_forest:
+            elif landscape_history[self.position[0], self.position[1]] >= self.config.end_of_seral_forest:
                 # If in this cell in the previous period, move, otherwise stay
                 if self.time_spent_in_cell > 1:
-                    self.position =  cell_choice(self.position, self.home_range, self.memory)
+                    self.position =  cell_choice(self.position, self.memory, timestep, self.config)
                     self.time_spent_in_cell = 1
                 else:
                     self.time_spent_in_cell += 1
@@ -215,12 +607,12 @@ class Deer:
         # Increases the deer's fitness depending on the forest type and update feeding history
         # Case 1: Old-growth forest
         if landscape[self.position[0], self.position[1]] == 0:
-            intake = min(max_food_gain_deer, landscape_nutrition[self.position[0], self.position[1]]*food_factor_old_growth)
+            intake = min(self.config.max_food_gain_deer, landscape_nutrition[self.position[0], self.position[1]]*food_factor_old_growth)
             self.fitness += intake
             self.feed_history[0] += intake
         # Case 2: New-growth forest
         else:
-            intake = min(max_food_gain_deer, landscape_nutrition[self.position[0], self.position[1]]*food_factor_new_growth)
+            intake = min(self.config.max_food_gain_deer, landscape_nutrition[self.position[0], self.position[1]]*food_factor_new_growth)
             self.fitness += intake
             self.feed_history[0] += intake
             
@@ -228,92 +620,97 @@ class Deer:
             
 
 
-    def update_homerange(self):
+    def update_homerange(self, timestep):
         
-        # If the deer is undernourished, expand home range starting from the original position and reset spatial memory
+        # If the deer is undernourished, expand home range starting from the original position and reset spatial memory.
+        # Returns the number of cells added to the home range.
         if self.feed_history[0]/self.feed_history[1] < 1:
-            if self.movement_radius < mt.floor(landscape_size/2):
+            if self.movement_radius < mt.floor(self.config.landscape_size/2):
+                previous_size = len(self.home_range)
                 self.movement_radius += 1
-                self.home_range = neighbor_dict[self.movement_radius][self.original_position].copy()
-                self.home_range.append(self.original_position)
-                self.memory = [float('inf')]*len(self.home_range)
-                self.memory[self.home_range.index(self.position)] = 0
+                self.home_range = home_range_cells(self.original_position, self.movement_radius, self.config.landscape_size)
+                self.memory = spatial_memory(self.home_range, self.position, timestep, self.config)
+                return len(self.home_range) - previous_size
+        
+        return 0
 
         
 
 class Wolf:
     
-    def __init__(self, ID):
+    def __init__(self, ID, config, position, timestep = 0):
         
-        # Assigns individual ID
+        # Assigns individual ID and the parameters
         self.id = ID
+        self.config = config
         
         # Initializes fitness
-        self.fitness = initial_fitness_wolf
+        self.fitness = config.initial_fitness_wolf
         
-        # Initializes a random position within the landscape and assigns it to memory
-        self.position = (rd.randint(0,landscape_size-1),rd.randint(0,landscape_size-1))
+        # Initializes the position within the landscape (random for the first wolves, the parent's position for offspring)
+        self.position = position
         self.original_position = self.position
         
         # Sets up a counter how long the wolf has been in the cell
         self.time_spent_in_cell = 1
         
         # Sets up a counter how long ago the last kill was
-        self.time_since_recent_kill = hunt_refresh_time
+        self.time_since_recent_kill = config.hunt_refresh_time
         
         # Defines a distance parameter that specifies the radius of the homerange around the base
-        self.movement_radius = mt.ceil(landscape_size/4)
+        self.movement_radius = mt.ceil(config.landscape_size/4)
         
         # Defines an initial home range around the position
-        self.home_range = neighbor_dict[self.movement_radius][self.position].copy()
-        self.home_range.append(self.position)
+        self.home_range = home_range_cells(self.position, self.movement_radius, config.landscape_size)
         
-        # Sets up a list of counters how long ago cells in the home range have been visited
-        self.memory = [float('inf')]*len(self.home_range)
-        self.memory[self.home_range.index(self.position)] = 0
+        # Sets up the timesteps at which cells in the home range have last been visited
+        self.memory = spatial_memory(self.home_range, self.position, timestep, self.config)
         
         # Defines a feeding counter
         self.feed_history = [0,0]
 
         
         
-    def move(self, landscape, landscape_history):
+    def move(self, landscape, landscape_history, timestep):
 
         # Determines movement based on forest type
         # Case 1: Old-growth forest
         if landscape[self.position[0], self.position[1]] == 0:
             # If last two time periods already in this cell, move and reset counter, otherwise stay and increase
             if self.time_spent_in_cell > 2:
-                self.position =  cell_choice(self.position, self.home_range, self.memory)
+                self.position =  cell_choice(self.position, self.memory, timestep, self.config)
                 self.time_spent_in_cell = 1
             else:
                 self.time_spent_in_cell += 1
         # Case 2: New-growth forest
         else:
             # Case 2a: If in seral forest, move immediately
-            if landscape_history[self.position[0], self.position[1]] < end_of_seral_forest:
-                self.position =  cell_choice(self.position, self.home_range, self.memory)
+            if landscape_history[self.position[0], self.position[1]] < self.config.end_of_seral_forest:
+                self.position =  cell_choice(self.position, self.memory, timestep, self.config)
                 self.time_spent_in_cell = 1
             # Case 2b: Closed canopy new-growth
-            elif landscape_history[self.position[0], self.position[1]] >= end_of_seral_forest:
+            elif landscape_history[self.position[0], self.position[1]] >= self.config.end_of_seral_forest:
                 # If in this cell in the previous period, move, otherwise stay
                 if self.time_spent_in_cell > 1:
-                    self.position =  cell_choice(self.position, self.home_range, self.memory)
+                    self.position =  cell_choice(self.position, self.memory, timestep, self.config)
                     self.time_spent_in_cell = 1
                 else:
                     self.time_spent_in_cell += 1
                     
                     
-    def update_homerange(self):
+    def update_homerange(self, timestep):
         
-        # If the wolf is undernourished, expand home range starting from the original position and reset spatial memory
+        # If the wolf is undernourished, expand home range starting from the original position and reset spatial memory.
+        # Returns the number of cells added to the home range.
         if self.feed_history[0]/self.feed_history[1] < 1:
-            if self.movement_radius < landscape_size - 1:
+            if self.movement_radius < self.config.landscape_size - 1:
+                previous_size = len(self.home_range)
                 self.movement_radius += 1
-                self.home_range = neighbor_dict[self.movement_radius][self.original_position].copy()
-                self.home_range.append(self.original_position)
-                self.memory = [float('inf')]*len(self.home_range)
-                self.memory[self.home_range.index(self.position)] = 0
+                self.home_range = home_range_cells(self.original_position, self.movement_radius, self.config.landscape_size)
+                self.memory = spatial_memory(self.home_range, self.position, timestep, self.config)
+                return len(self.home_range) - previous_size
+        
+        return 0
         
     
         
@@ -321,7 +718,13 @@ class Wolf:
 class Environment:
     
     
-    def __init__(self, policy_in_effect):
+    def __init__(self, policy_in_effect, config = default_config, streams = global_streams):
+        
+        # Stores the parameters, the policy and the random number streams
+        self.config = config
+        self.policy_in_effect = policy_in_effect
+        self.streams = streams
+        landscape_size = config.landscape_size
         
         # Generates a square landscape with nxn cells normalized to 0 (old-growth)
         self.landscape = np.zeros((landscape_size, landscape_size))
@@ -333,72 +736,43 @@ class Environment:
         self.landscape_nutrition = np.full([landscape_size,landscape_size], np.nan)
         
         # Generates a backup landscape that can define a protected block in the middle of the landscape
-        self.protected_zone = np.zeros((landscape_size,landscape_size))
-        
-        # If a policy is in place, protect the block
-        if policy_in_effect:
-            
-            indeces_to_protect = []
-            
-            number_of_columns_reserved_for_protection = landscape_size - mt.ceil(no_cells_logged_per_month*9/landscape_size)
-            
-            for i in range(landscape_size):
-                for j in range(number_of_columns_reserved_for_protection):
-                    indeces_to_protect.append((i,j))
-            
-            for i in indeces_to_protect:
-                self.protected_zone[i[0],i[1]] = 1
+        self.protected_zone = build_protected_zone(policy_in_effect, config)
                 
         self.loggable_cells = list(zip(*np.where(self.protected_zone == 0)))
         
+        # Sets up the current timestep (the last day that has been simulated)
+        self.timestep = 0
+        
         # Puts predefined number of deer in the landscape
-        self.deers = [Deer(ID = i) for i in range(n_deers)]
-        self.deer_counter = n_deers
+        positions = streams.initialization.positions(config.n_deers, landscape_size)
+        self.deers = [Deer(ID = i, config = config, position = positions[i]) for i in range(config.n_deers)]
+        self.deer_counter = config.n_deers
         
         # Puts predefined number of wolves in the landscape
-        self.wolves = [Wolf(ID = i) for i in range(n_wolves)]
-        self.wolf_counter = n_wolves
+        positions = streams.initialization.positions(config.n_wolves, landscape_size)
+        self.wolves = [Wolf(ID = i, config = config, position = positions[i]) for i in range(config.n_wolves)]
+        self.wolf_counter = config.n_wolves
+        
+        # Sets up the running totals of both species
+        self.totals = {'Deer': PopulationTotals(self.deers), 'Wolf': PopulationTotals(self.wolves)}
         
         # Sets up data collection for population dynamics
-        self.pop_dynam = pd.DataFrame([{"timestep": 0,
-                                       "n_deer": n_deers,
-                                       "n_wolves": n_wolves,
-                                       'hr_deer': avg_hr_size(self, 'Deer'),
-                                       'hr_wolves': avg_hr_size(self, 'Wolf')}])
-        
-        # Sets up data collection for birth and death rates and appropriate counters
-        # self.birth_death = pd.DataFrame([{"timestep": 0,
-        #                                   "deer_born": 0,
-        #                                   "deer_died": 0,
-        #                                   "wolves_born": 0,
-        #                                   "wolves_died": 0}])
-        
-        # self.deer_birth_counter = 0
-        # self.deer_death_counter = 0
-        # self.wolf_birth_counter = 0
-        # self.wolf_death_counter = 0
-        
-        
-        # # Sets up tracking for deer and wolves separately
-        # self.deer_tracking = pd.DataFrame([{"deerid": deer.id, 
-        #                                     "timestep": 0, 
-        #                                     "xpos": deer.position[0], 
-        #                                     "ypos": deer.position[1],
-        #                                     "fitness": deer.fitness} for deer in self.deers])
-        
-        # self.wolf_tracking = pd.DataFrame([{"wolfid": wolf.id, 
-        #                                     "timestep": 0, 
-        #                                     "xpos": wolf.position[0], 
-        #                                     "ypos": wolf.position[1],
-        #                                     "fitness": wolf.fitness} for wolf in self.wolves])
+        self.recorder = population_recorder(config)
+        self.recorder.record(self, 0)
         
+    @property
+    def pop_dynam(self):
         
+        # Population dynamics as a DataFrame (timestep, n_deer, n_wolves, hr_deer, hr_wolves)
+        return self.recorder.to_frame()
+    
+    
     def logging(self):
         
         set_of_unlogged_cells =  list(zip(*np.where(self.landscape == 0)))
         set_of_possible_cells = [i for i in set_of_unlogged_cells if i in self.loggable_cells]
 
-        draw = rd.sample(set_of_possible_cells,no_cells_logged_per_month)
+        draw = self.streams.logging.sample(set_of_possible_cells,self.config.no_cells_logged_per_month)
         
         for cell in draw:
             self.landscape[cell] = 1
@@ -408,58 +782,43 @@ class Environment:
     
     def available_food(self):
         
-        # For each forest cell
-        for i in range(landscape_size):
-            for j in range(landscape_size):
-                
-                # Count the number of deer in the cell
-                check = []
-                
-                for deer in self.deers:
-                    check.append(deer.position[0] == i and deer.position[1] == j)
-                    
-                deer_in_cell = check.count(True)
-                
-                # For cells with deer presence, calculate nutrition depending on forest type
-                if deer_in_cell > 0:
-                    # Case 1: Old-growth forest
-                    if self.landscape[i,j] == 0:
-                        # Base nutrition divided by number of deer in cell
-                        self.landscape_nutrition[i,j] = old_growth_base_nutrition/deer_in_cell
-                    # Case 2: New-growth
-                    else:
-                        # Case 2a: Seral period
-                        if self.landscape_history[i,j] < end_of_seral_forest:
-                            # Marginally decreasing growth divided by number of deer in cell
-                            self.landscape_nutrition[i,j] = biomass_growth(self.landscape_history[i,j])/deer_in_cell
-                        # Case 2b: Closed canopy 
-                        elif self.landscape_history[i,j] >= end_of_seral_forest:
-                            # New base nutrition divided by number of deer in cell
-                            self.landscape_nutrition[i,j] = new_growth_base_nutrition/deer_in_cell
+        # Counts the number of deer in each cell in one pass over their positions
+        size = self.config.landscape_size
+        deer_in_cell = occupancy_grid(np.array([deer.position[0]*size + deer.position[1] for deer in self.deers], dtype = int), self.config)
+        
+        # Calculates nutrition for all cells with deer presence depending on forest type
+        update_nutrition(self.landscape, self.landscape_history, self.landscape_nutrition, deer_in_cell, self.config)
     
     
     def predation(self):
         
+        config = self.config
+        
         # Simulates predation
+        # Builds an index of the deer in each cell (in the order of the deer list), once per day
+        deer_in_cell = {}
+        for deer in self.deers:
+            deer_in_cell.setdefault(deer.position, []).append(deer)
+        
+        # If wolf has not killed recently, it encounters the deer in its cell
+        hunters = [wolf for wolf in self.wolves if wolf.time_since_recent_kill >= config.hunt_refresh_time]
+        encounters = [deer_in_cell.get(wolf.position, []) for wolf in hunters]
+        
+        # Draws a random 0/1 with the kill rate as the probability for every encounter, until the first success
+        first = self.streams.predation.first_successes(config.predation_efficiency, [len(prey) for prey in encounters])
+        
+        for wolf, prey, k in zip(hunters, encounters, first):
+            # Kills the first deer with a successful draw (at most one kill per wolf),
+            # increases wolf's fitness and resets hunting counter
+            if k >= 0:
+                deer = prey[k]
+                wolf.fitness = wolf.fitness + config.gain_from_deer
+                deer.fitness = 0
+                wolf.time_since_recent_kill = -1
+                wolf.feed_history[0] += config.gain_from_deer
+        
+        # Adds to the counters
         for wolf in self.wolves:
-            # If wolf has not killed recently:
-            if wolf.time_since_recent_kill >= hunt_refresh_time:
-                # Check for all deer
-                for deer in self.deers:
-                    # Double check for a contemporary kill
-                    if wolf.time_since_recent_kill >= hunt_refresh_time:
-                        # Checks for all deer whether they are in the same cell
-                        if wolf.position == deer.position:
-                            # Draws a random 0/1 with the kill rate as the probability
-                            draw = np.random.binomial(1,predation_efficiency,1)
-                            # Increases wolf's fitness, kills deer, and resets hunting counter in case of success 
-                            if draw == 1:
-                                wolf.fitness = wolf.fitness + gain_from_deer
-                                deer.fitness = 0
-                                wolf.time_since_recent_kill = -1
-                                wolf.feed_history[0] += gain_from_deer
-                        
-            # Adds to the counters
             wolf.time_since_recent_kill += 1
             wolf.feed_history[1] += 1
             
@@ -467,262 +826,258 @@ class Environment:
     
     def reproduction(self):
         
+        config = self.config
+        births = self.wolf_counter + self.deer_counter
+        
         # Performs global reproduction for deer and wolves
         for wolf in self.wolves:
             # Create new wolf in the same position if parent fitness is high enough
-            if wolf.fitness > wolf_birth_threshold:
-                new_wolf = Wolf(ID = self.wolf_counter)
+            if wolf.fitness > config.wolf_birth_threshold:
+                new_wolf = Wolf(ID = self.wolf_counter, config = config, position = wolf.position, timestep = self.timestep)
                 self.wolf_counter += 1
-                # Update standard initialization
-                new_wolf.position = wolf.position
-                new_wolf.original_position = new_wolf.position
-                new_wolf.home_range = neighbor_dict[new_wolf.movement_radius][new_wolf.position].copy()
-                new_wolf.home_range.append(new_wolf.position)
-                new_wolf.memory = [float('inf')]*len(new_wolf.home_range)
-                new_wolf.memory[new_wolf.home_range.index(new_wolf.position)] = 0
                 # Add to list of wolves
                 self.wolves.append(new_wolf)
+                self.totals['Wolf'].add(new_wolf)
                 # Reduce fitness of parent
-                wolf.fitness = wolf.fitness - wolf_birth_loss
-                #self.wolf_birth_counter += 1
+                wolf.fitness = wolf.fitness - config.wolf_birth_loss
                 
         for deer in self.deers:
             # Same for deer
-            if deer.fitness > deer_birth_threshold:
+            if deer.fitness > config.deer_birth_threshold:
                 # Create new deer
-                new_deer = Deer(ID = self.deer_counter)
+                new_deer = Deer(ID = self.deer_counter, config = config, position = deer.position, timestep = self.timestep)
                 self.deer_counter += 1
-                # Update standard initialization
-                new_deer.position = deer.position
-                new_deer.original_position = new_deer.position
-                new_deer.home_range = neighbor_dict[new_deer.movement_radius][new_deer.position].copy()
-                new_deer.home_range.append(new_deer.position)
-                new_deer.memory = [float('inf')]*len(new_deer.home_range)
-                new_deer.memory[new_deer.home_range.index(new_deer.position)] = 0
                 # Add to list of deer
                 self.deers.append(new_deer)
-                deer.fitness = deer.fitness - deer_birth_loss
-                #self.deer_birth_counter += 1
+                self.totals['Deer'].add(new_deer)
+                deer.fitness = deer.fitness - config.deer_birth_loss
+        
+        self.streams.initialization.skip_positions(self.wolf_counter + self.deer_counter - births, config.landscape_size)
                 
     
     
     def kill_animals(self):
         
-        for j, deer in enumerate(self.deers):
-            
-            # Decreases fitness linearly
-            deer.fitness = deer.fitness - fitness_loss_deer
-            
-            if deer.fitness <= 0:
-                self.deers.remove(deer)
-                #self.deer_death_counter += 1
-                
-        for j, wolf in enumerate(self.wolves):
-            
-            # Decreases fitness linearly
-            wolf.fitness = wolf.fitness - fitness_loss_wolves
-            
-            if wolf.fitness <= 0:
-                self.wolves.remove(wolf)
-                #self.wolf_death_counter += 1
+        # Ages every animal and removes the dead ones
+        config = self.config
+        self.deers = age_and_remove(self.deers, config.fitness_loss_deer, config.legacy_removal, self.totals['Deer'])
+        self.wolves = age_and_remove(self.wolves, config.fitness_loss_wolves, config.legacy_removal, self.totals['Wolf'])
         
         
         
-    def simulation(self):
+    def tracking_columns(self, animals):
         
-        # Sets up a counter for determining the season
-        season_counter = 0
+        # Returns the replicate, id, position and fitness of a list of animals as columns for an AgentTracker
+        positions = np.array([animal.position for animal in animals], dtype = np.int64).reshape((-1, 2))
+        
+        return {'replicate': np.zeros(len(animals), dtype = np.int64),
+                'id': np.array([animal.id for animal in animals], dtype = np.int64),
+                'x': positions[:, 0],
+                'y': positions[:, 1],
+                'fitness': np.array([animal.fitness for animal in animals], dtype = float)}
+    
+    
+    
+    def track(self, tracker, timestep):
+        
+        # Records the positions of the animals
+        tracker.record(timestep, 'Deer', self.tracking_columns(self.deers))
+        tracker.record(timestep, 'Wolf', self.tracking_columns(self.wolves))
+        
+        
+        
+    def set_scenario(self, policy_in_effect, config):
+        
+        # Switches to another logging intensity and policy, which only makes a difference once logging starts
+        self.config = config
+        self.policy_in_effect = policy_in_effect
+        self.protected_zone = build_protected_zone(policy_in_effect, config)
+        self.loggable_cells = list(zip(*np.where(self.protected_zone == 0)))
+        
+        for animal in self.deers + self.wolves:
+            animal.config = config
+    
+    
+    
+    def simulation(self, until = None, profiler = no_profiler, tracker = no_tracker):
+        
+        # Runs the days after the current timestep up to 'until' (the end of the simulation if None),
+        # so that a simulation can be continued, e.g. from a snapshot.
+        # With a PhaseProfiler, the wall time of every phase and the population sizes are recorded.
+        # With an AgentTracker, the trajectories, births and deaths of individual animals are recorded.
+        
+        config = self.config
+        month_ticks = config.month_ticks
+        
+        if until is None:
+            until = config.timesteps
+        
+        if self.timestep == 0 and tracker.tracking(0):
+            self.track(tracker, 0)
         
         # Runs one simulation
-        for timestep in range(1,timesteps+1):
+        for timestep in range(self.timestep+1,until+1):
+            
+            self.timestep = timestep
+            profiler.start_day(timestep)
             
             # Registers seasonal changes and resets once one year is over
-            season_counter += 1
-            if season_counter > length_year:
-                season_counter = 1
+            season_counter = (timestep - 1) % config.length_year + 1
             
             # Registers changes to the forest
             # Adds one time period for all new-growth cells (old-growth are NaNs, adding does nothing)
             self.landscape_history += 1
+            profiler.lap('landscape_aging')
             
             # If under the cap, within in the logging window and not in winter, register possible logging.
-            if timestep >= start_of_logging and timestep < stop_of_logging:
+            if timestep >= config.start_of_logging and timestep < config.stop_of_logging:
                 if season_counter in month_ticks:
                     self.logging()
+                    profiler.lap('logging')
                 
             # Moves the animals
             for deer in self.deers:
-                deer.move(self.landscape, self.landscape_history)
+                deer.move(self.landscape, self.landscape_history, timestep)
             
             for wolf in self.wolves:
-                wolf.move(self.landscape, self.landscape_history) 
+                wolf.move(self.landscape, self.landscape_history, timestep) 
+            profiler.lap('move')
                 
             # Calculates available nutrition for deer:
             self.available_food()
+            profiler.lap('available_food')
             
             for deer in self.deers:
                 # Feeds the deer depending on season
-                if season_counter < beginning_of_winter:
-                    deer.feed(self.landscape, self.landscape_nutrition, summer_food_factor_old_growth,summer_food_factor_new_growth)
+                if season_counter < config.beginning_of_winter:
+                    deer.feed(self.landscape, self.landscape_nutrition, config.summer_food_factor_old_growth,config.summer_food_factor_new_growth)
                 else:
-                    deer.feed(self.landscape, self.landscape_nutrition, winter_food_factor_old_growth,winter_food_factor_new_growth)
+                    deer.feed(self.landscape, self.landscape_nutrition, config.winter_food_factor_old_growth,config.winter_food_factor_new_growth)
                 
                 # Checks for home range expansions and resets food counter every year    
-                if season_counter == length_year:
-                    deer.update_homerange()
+                if season_counter == config.length_year:
+                    self.totals['Deer'].home_range += deer.update_homerange(timestep)
                     deer.feed_history = [0,0]
+            profiler.lap('feed')
                 
             
             # Registers global predation
             self.predation()
+            profiler.lap('predation')
             
             # Updates home ranges for wolves (after predation)
             for wolf in self.wolves:
-                if season_counter == length_year:
-                    wolf.update_homerange()
+                if season_counter == config.length_year:
+                    self.totals['Wolf'].home_range += wolf.update_homerange(timestep)
                     wolf.feed_history = [0,0]
+            profiler.lap('update_homerange')
         
             
-            # Registers global reproduction
+            # Registers global reproduction (newborns are appended to the lists)
+            n_deers, n_wolves = len(self.deers), len(self.wolves)
             self.reproduction()
+            if tracker.events:
+                tracker.event(timestep, 'Deer', 'birth', self.tracking_columns(self.deers[n_deers:]))
+                tracker.event(timestep, 'Wolf', 'birth', self.tracking_columns(self.wolves[n_wolves:]))
+            profiler.lap('reproduction')
                 
             # Eliminates dead animals   
+            deers, wolves = self.deers, self.wolves
             self.kill_animals()
+            if tracker.events:
+                tracker.event(timestep, 'Deer', 'death', self.tracking_columns(removed_animals(deers, self.deers)))
+                tracker.event(timestep, 'Wolf', 'death', self.tracking_columns(removed_animals(wolves, self.wolves)))
+            profiler.lap('kill_animals')
                 
             # Updates tracking tables
-            self.pop_dynam = pd.concat([self.pop_dynam,
-                                       pd.DataFrame([{"timestep": timestep,
-                                                     "n_deer": len(self.deers),
-                                                     "n_wolves": len(self.wolves),
-                                                     'hr_deer': avg_hr_size(self, 'Deer'),
-                                                     'hr_wolves': avg_hr_size(self, 'Wolf')}])])
-            
-            # self.birth_death = pd.concat([self.birth_death,
-            #                               pd.DataFrame([{"timestep": timestep,
-            #                                              "deer_born": self.deer_birth_counter,
-            #                                              "deer_died": self.deer_death_counter,
-            #                                              "wolves_born": self.wolf_birth_counter,
-            #                                              "wolves_died": self.wolf_death_counter}])])
-            
-            # # Reset counters
-            # self.deer_birth_counter = 0
-            # self.deer_death_counter = 0
-            # self.wolf_birth_counter = 0
-            # self.wolf_death_counter = 0
-            
-            
-            # self.deer_tracking = pd.concat([self.deer_tracking,
-            #                           pd.DataFrame([{"deerid": deer.id,
-            #                                          "timestep": timestep,
-            #                                          "xpos": deer.position[0],
-            #                                          "ypos": deer.position[1],
-            #                                          "fitness": deer.fitness} for deer in self.deers])])
-            
-            # self.wolf_tracking = pd.concat([self.wolf_tracking,
-            #                           pd.DataFrame([{"wolfid": wolf.id,
-            #                                           "timestep": timestep,
-            #                                           "xpos": wolf.position[0],
-            #                                           "ypos": wolf.position[1],
-            #                                           "fitness": wolf.fitness} for wolf in self.wolves])])
+            self.recorder.record(self, timestep)
+            if tracker.tracking(timestep):
+                self.track(tracker, timestep)
+            profiler.lap('recording')
+            profiler.end_day(self)
             
 
 #------------------------------------------------------------------------------
 
-# ONE SIMULATION (for a quick glance)
+# SNAPSHOTS
 
-# Simulate
-
-start_time = time.time()
-environment = Environment(policy_in_effect = True)
-environment.simulation()
-print("--- %s seconds ---" % (time.time() - start_time))
-
-# Plot Population dynamics
-plt.figure(figsize = (12,8))
-plt.plot(environment.pop_dynam.timestep,environment.pop_dynam.n_deer)
-plt.plot(environment.pop_dynam.timestep,environment.pop_dynam.n_wolves)
-plt.xlabel("Days")
-plt.ylabel("Population size")
-plt.title("Population dynamics")
-plt.legend(["Deer", "Wolves"])
-plt.axvline(x = start_of_logging, color = 'black')
-plt.axvline(x = stop_of_logging, color = 'black')
-plt.axvline(x = stop_of_logging + end_of_seral_forest, color = 'black')
-    
-#------------------------------------------------------------------------------
-
-# MULTIPROCESSING OUTPUT - DEER ONLY
-
-# PARAMETER CHANGES
+# Until logging starts, simulations that only differ in the logging intensity or the policy are identical.
+# A snapshot holds a copy of the complete state of an environment (landscapes, animals, recorded data, own random number
+# streams) and of the global random number generators, so that one burn-in can be continued into every logging intensity and policy.
+# Works for the environments of both engines ('ecol_1_model_vectorized.py' provides the same set_scenario method).
 
-# no_cells_logged_per_month = 8
-# n_wolves = 0
+# Function that returns the objects that are shared instead of copied: the immutable configuration and the global generators
+def shared_objects(environment):
+    return {id(environment.config): environment.config, id(global_random): global_random}
 
-# import multiprocess
 
-# version = str(1)
-# n_simulations = 102 # must be divisible by 3
-
-# set_of_ranges = [1] 
+def take_snapshot(environment):
+    
+    return {'environment': copy.deepcopy(environment, shared_objects(environment)),
+            'python_random': rd.getstate(),
+            'numpy_random': np.random.get_state()}
 
-# for i in range(1,multiprocess.cpu_count()-1):
-#     set_of_ranges.append(i*(int(n_simulations/(multiprocess.cpu_count()-1))) + 1)
 
-# def deer_only_simulations(start):
+def restore_snapshot(snapshot, policy_in_effect = None, config = None):
+    
+    # Returns a new environment in the state of the snapshot and resets the random number generators to that state.
+    # With a policy or a configuration, the environment branches into another scenario. Only the logging intensity
+    # may differ from the configuration of the snapshot, and logging must not have started yet.
     
-#     for i in range(start,start + int(n_simulations/(multiprocess.cpu_count()-1))):
-#         environment = Environment(policy_in_effect = False)
-#         environment.simulation()
-#         environment.pop_dynam.to_csv('output/deer_only/v'+version+'/pop_dynam_'+str(i)+'.csv', index = False)
+    saved = snapshot['environment']
+    environment = copy.deepcopy(saved, shared_objects(saved))
+    
+    rd.setstate(snapshot['python_random'])
+    np.random.set_state(snapshot['numpy_random'])
+    
+    if policy_in_effect is None:
+        policy_in_effect = saved.policy_in_effect
+    if config is None:
+        config = saved.config
+    
+    if policy_in_effect != saved.policy_in_effect or config != saved.config:
         
-  
-# start_time = time.time() 
-
-# if __name__ == '__main__':
-#     with multiprocess.Pool() as p:
-#         p.map(deer_only_simulations, set_of_ranges)
-
-
-# print('Program finished in ', time.time() - start_time, 'seconds.' )
-
-
-
-#-----------------------------------------------------------------------------
+        if replace(config, no_cells_logged_per_month = saved.config.no_cells_logged_per_month) != saved.config:
+            raise ValueError('Only the logging intensity and the policy can differ from the snapshot')
+        if saved.timestep >= saved.config.start_of_logging:
+            raise ValueError('The snapshot was taken after logging started')
+        
+        environment.set_scenario(policy_in_effect, config)
+    
+    return environment
 
-# MULTI PROCESSING OUTPUT - LOGGING INTENSITY AND POLICIES
 
-# PARAMETER CHANGES
-# no_cells_logged_per_month = 1 #vary between 0 and 13
+#------------------------------------------------------------------------------
 
-# import multiprocess
+# ONE SIMULATION (for a quick glance)
 
-# version = str(1)
-# n_simulations = 1002 # must be divisible by 3
+# Only runs when the script is executed directly, so that other scripts can import the model
 
-# set_of_ranges = [1] 
+if __name__ == '__main__':
 
-# for i in range(1,multiprocess.cpu_count()-1):
-#     set_of_ranges.append(i*(int(n_simulations/(multiprocess.cpu_count()-1))) + 1)
+    # Simulate
     
-# def simulations_logging_intensity(start):
-
-#     for i in range(start,start + int(n_simulations/(multiprocess.cpu_count()-1))):
-  
-#        environment = Environment(policy_in_effect = False)
-#       environment.simulation()
-#        environment.pop_dynam.to_csv('output/logging_intensity/v'+version+'/'+str(no_cells_logged_per_month)+'/pop_dynam_'+str(i)+'.csv', index = False)
-        
-        # uncomment for the protection scenarios
-        # environment = Environment(policy_in_effect = True)
-        # environment.simulation()
-        # environment.pop_dynam.to_csv('output/protection/v'+version+'/'+str(no_cells_logged_per_month) +'/pop_dynam_'+str(i)+'.csv', index = False)
-                    
-
-# start_time = time.time() 
-
-# if __name__ == '__main__':
-#    with multiprocess.Pool() as p:
-#        p.map(simulations_logging_intensity, set_of_ranges)
+    start_time = time.time()
+    environment = Environment(policy_in_effect = True)
+    profiler = PhaseProfiler(sample_every = 30)
+    environment.simulation(profiler = profiler)
+    print("--- %s seconds ---" % (time.time() - start_time))
+    print(profiler.report())
+    
+    # Plot Population dynamics
+    plt.figure(figsize = (12,8))
+    plt.plot(environment.pop_dynam.timestep,environment.pop_dynam.n_deer)
+    plt.plot(environment.pop_dynam.timestep,environment.pop_dynam.n_wolves)
+    plt.xlabel("Days")
+    plt.ylabel("Population size")
+    plt.title("Population dynamics")
+    plt.legend(["Deer", "Wolves"])
+    plt.axvline(x = default_config.start_of_logging, color = 'black')
+    plt.axvline(x = default_config.stop_of_logging, color = 'black')
+    plt.axvline(x = default_config.stop_of_logging + default_config.end_of_seral_forest, color = 'black')
+    
+#------------------------------------------------------------------------------
 
-# print('Program finished in ', time.time() - start_time, 'seconds.' )
+# MULTIPROCESSING OUTPUT
 
+# Big sets of simulations (deer only, logging intensities and policies) are run in parallel with 'run_ensemble' in 'ecol_1_ensemble.py'.
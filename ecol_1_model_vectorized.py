@@ -0,0 +1,687 @@
+# VECTORIZED VERSION OF THE MODEL TO SIMULATE DEER AND WOLF POPULATION DYNAMICS IN A LOGGED FOREST
+
+# Author: Peter Kamal
+# Python version: 3.9.13
+# Last update: 17/10/26
+
+# Note: This is an alternative simulation engine for the model in 'ecol_1_model.py'. It follows exactly the same rules,
+# but instead of one Python object per animal it keeps all animals of a species in parallel NumPy arrays
+# (structure of arrays), so that every phase of a day is a handful of array operations instead of loops over animals.
+# 'BatchedEnvironment' advances several independent replicates at once: landscapes are stacked along a first
+# replicate axis and every animal is tagged with the replicate it lives in. 'VectorizedEnvironment' is the single-replicate case.
+# Parameters are read from the same ModelConfig as the object-based Environment in 'ecol_1_model.py'.
+# The population dynamics are stored in the same format, so the output can be fed to 'ecol_2_data_transformation.py'.
+
+#------------------------------------------------------------------------------
+
+# IMPORTS AND OPTIONS
+import time
+import numpy as np
+import math as mt
+from functools import lru_cache
+import ecol_1_model as model
+from ecol_1_tracking import no_tracker
+
+#------------------------------------------------------------------------------
+
+# HELPER FUNCTIONS
+
+# Function that returns, for every cell (flat index x*landscape_size + y), the flat indices of its 8 neighbors.
+# The order is the same as in 'clipped_range' (see 'ecol_1_model.py'), cells outside of the landscape are marked with -1.
+# The table is built once per landscape size and shared by all environments.
+@lru_cache(maxsize = None)
+def adjacency_table(size):
+
+    table = np.full((size*size, 8), -1, dtype=np.int64)
+
+    for x in range(size):
+        for y in range(size):
+            k = 0
+            for dx in range(-1, 2):
+                for dy in range(-1, 2):
+                    if (dx, dy) == (0, 0):
+                        continue
+                    if 0 <= x + dx < size and 0 <= y + dy < size:
+                        table[x*size + y, k] = (x + dx)*size + (y + dy)
+                    k += 1
+
+    return table
+
+
+# Function that returns the number of cells in the home ranges (square around the original position clipped to the landscape)
+def home_range_sizes(original_position, movement_radius, size):
+
+    x, y = original_position // size, original_position % size
+    width = np.minimum(x + movement_radius, size - 1) - np.maximum(x - movement_radius, 0) + 1
+    height = np.minimum(y + movement_radius, size - 1) - np.maximum(y - movement_radius, 0) + 1
+
+    return width*height
+
+
+# Function that reproduces which animals the list-based 'kill_animals' processed before the removal was fixed.
+# Removing an animal from a list while iterating over it skips the next animal, so within a run
+# of consecutive animals that would die, only every second one is processed, and the animal following
+# a processed dying animal is skipped as well. 'group_start' marks the first animal of every separate list (replicate).
+def legacy_processed_mask(would_die, group_start):
+
+    n = len(would_die)
+    index = np.arange(n)
+
+    # Start of every run of consecutive dying animals
+    previous_dies = np.concatenate(([False], would_die[:-1])) & ~group_start
+    run_starts = would_die & ~previous_dies
+    run_start = np.maximum.accumulate(np.where(run_starts, index, 0)) if n > 0 else index
+
+    processed = np.ones(n, dtype=bool)
+    processed[would_die] = ((index - run_start) % 2 == 0)[would_die]
+
+    # The animal after a processed dying animal is skipped
+    processed[1:] &= ~(would_die[:-1] & processed[:-1] & ~group_start[1:])
+
+    return processed
+
+
+# Function that returns, for every animal, its rank among the animals of the same replicate (in the order given)
+def rank_within_replicate(replicate):
+
+    order = np.argsort(replicate, kind = 'stable')
+    sorted_replicate = replicate[order]
+    rank = np.empty(len(replicate), dtype = np.int64)
+    rank[order] = np.arange(len(replicate)) - np.searchsorted(sorted_replicate, sorted_replicate, side = 'left')
+
+    return rank
+
+
+#------------------------------------------------------------------------------
+
+# CLASS SETUPS
+
+class AgentArrays:
+
+    # Holds all animals of one species in a pool of parallel arrays. Slot k of every array belongs to the same animal.
+    # The arrays keep spare capacity: births are written into free slots (the slots of dead animals are recycled and the
+    # capacity doubles when no slot is left), deaths only clear the 'alive' flag of their slots.
+    # Every animal keeps its id for life (numbered in order of birth within its replicate, as in the object-based Environment),
+    # and steps that depend on the order of the animals take them by replicate and id ('in_order'), which is the order
+    # of the lists of the object-based Environment.
+    # Positions are flat cell indices (x*landscape_size + y) within the landscape of the animal's replicate.
+    # The spatial memory of an animal only covers its home range (the square around its original position clipped to the
+    # landscape): it is a block of 'visits', row by row, that starts at 'memory_offset'. Blocks are appended to the
+    # buffer at births and home range expansions, and the blocks of the living animals are moved together
+    # when the buffer is full, so that the memory grows with the home ranges instead of the landscape.
+
+    # Arrays of the pool with their dtype (feed_history has two columns per slot)
+    arrays = {'replicate': np.int64, 'id': np.int64, 'position': np.int64, 'original_position': np.int64, 'fitness': float,
+              'time_spent_in_cell': np.int64, 'movement_radius': np.int64, 'time_since_recent_kill': np.int64,
+              'feed_history': float, 'memory_offset': np.int64, 'alive': bool}
+
+    # Timestep of the cells that have not been visited since the home range was set up
+    never_visited = np.iinfo(np.int32).min
+
+    def __init__(self, replicate, position, initial_fitness, movement_radius, timestep, config):
+
+        self.config = config
+        self.capacity = 0
+        self.n_alive = 0
+        self.free = np.empty(0, dtype=np.int64)
+
+        # Feeding counter: column 0 holds the food intake, column 1 the number of days
+        for name, dtype in self.arrays.items():
+            setattr(self, name, np.zeros((0, 2) if name == 'feed_history' else 0, dtype=dtype))
+
+        # Spatial memory: timestep at which each cell of the home range was last visited
+        self.visits = np.zeros(0, dtype=np.int32)
+        self.visits_end = 0
+
+        replicate = np.asarray(replicate, dtype=np.int64)
+        self.add(replicate, rank_within_replicate(replicate), position, initial_fitness, movement_radius, timestep)
+
+
+    def __len__(self):
+        return self.n_alive
+
+
+    def cell(self):
+
+        # Cell index across all replicates (replicate*landscape_size**2 + position), for every slot
+        return self.replicate*self.config.landscape_size**2 + self.position
+
+
+    def living(self):
+
+        # Slots of the living animals
+        return np.flatnonzero(self.alive)
+
+
+    def in_order(self):
+
+        # Slots of the living animals by replicate and id
+        living = self.living()
+        ids = self.id[living]
+        return living[np.argsort(self.replicate[living]*(ids.max(initial = 0) + 1) + ids)]
+
+
+    def grow(self, capacity):
+
+        # Moves all arrays into larger ones, the new slots are free (the lowest slots are used first)
+        for name in self.arrays:
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.capacity] = old
+            setattr(self, name, new)
+
+        self.free = np.concatenate((self.free, np.arange(capacity - 1, self.capacity - 1, -1)))
+        self.capacity = capacity
+
+
+    def add(self, replicate, ids, position, initial_fitness, movement_radius, timestep):
+
+        # Writes new animals into free slots, doubling the capacity as often as needed, and returns their slots
+        n = len(position)
+
+        if n > len(self.free):
+            capacity = max(self.capacity, 1)
+            while capacity - self.capacity + len(self.free) < n:
+                capacity *= 2
+            self.grow(capacity)
+
+        slots = self.free[len(self.free) - n:][::-1]
+        self.free = self.free[:len(self.free) - n]
+
+        self.replicate[slots] = replicate
+        self.id[slots] = ids
+        self.position[slots] = position
+        self.original_position[slots] = position
+        self.fitness[slots] = initial_fitness
+        self.time_spent_in_cell[slots] = 1
+        self.movement_radius[slots] = movement_radius
+        self.time_since_recent_kill[slots] = self.config.hunt_refresh_time
+        self.feed_history[slots] = 0
+        self.alive[slots] = True
+        self.n_alive += n
+        self.reset_memory(slots, timestep)
+
+        return slots
+
+
+    def memory_index(self, slots, cells):
+
+        # Position of the cells in the memory blocks of the animals in the slots (the cells must be in their home ranges)
+        size = self.config.landscape_size
+        radius = self.movement_radius[slots]
+        x0 = np.maximum(self.original_position[slots] // size - radius, 0)
+        y0 = np.maximum(self.original_position[slots] % size - radius, 0)
+        width = np.minimum(self.original_position[slots] % size + radius, size - 1) - y0 + 1
+
+        return self.memory_offset[slots] + (cells // size - x0)*width + (cells % size - y0)
+
+
+    def reset_memory(self, slots, timestep):
+
+        # Sets up a new memory block for the current home range of the animals in the slots, in which only the
+        # current position has been visited (the previous blocks of these animals are dropped)
+        sizes = home_range_sizes(self.original_position[slots], self.movement_radius[slots], self.config.landscape_size)
+        needed = int(sizes.sum())
+
+        if self.visits_end + needed > len(self.visits):
+            self.compact_memory(slots, needed)
+
+        self.memory_offset[slots] = self.visits_end + np.cumsum(sizes) - sizes
+        self.visits[self.visits_end:self.visits_end + needed] = self.never_visited
+        self.visits_end += needed
+        self.visits[self.memory_index(slots, self.position[slots])] = timestep
+
+
+    def compact_memory(self, slots, needed):
+
+        # Moves the memory blocks of the living animals (except those in the slots) to the front of a buffer with
+        # room for at least as much again, so that compactions become rarer as the memory grows
+        keep = self.alive.copy()
+        keep[slots] = False
+        keep = np.flatnonzero(keep)
+
+        sizes = home_range_sizes(self.original_position[keep], self.movement_radius[keep], self.config.landscape_size)
+        total = int(sizes.sum())
+        capacity = max(len(self.visits), 1)
+        while 2*(total + needed) > capacity:
+            capacity *= 2
+
+        offsets = np.cumsum(sizes) - sizes
+        visits = np.empty(capacity, dtype=np.int32)
+        visits[:total] = self.visits[np.repeat(self.memory_offset[keep] - offsets, sizes) + np.arange(total)]
+
+        self.visits = visits
+        self.visits_end = total
+        self.memory_offset[keep] = offsets
+
+
+    def remove(self, slots):
+
+        # Frees the slots of dead animals
+        self.alive[slots] = False
+        self.free = np.concatenate((self.free, np.sort(slots)[::-1]))
+        self.n_alive -= len(slots)
+
+
+
+class BatchedEnvironment:
+
+
+    def __init__(self, policy_in_effect, n_replicates, config = model.default_config, streams = None):
+
+        # Stores the parameters, the policy and the random number streams of every replicate (by default, all replicates
+        # draw from the global generators). Every replicate draws only from its own streams, so with separate streams
+        # a replicate gives the same results in any batch.
+        self.config = config
+        self.policy_in_effect = policy_in_effect
+        self.streams = [model.global_streams]*n_replicates if streams is None else list(streams)
+        size = config.landscape_size
+        self.n_replicates = n_replicates
+
+        # Same landscapes as in the object-based Environment, one per replicate
+        self.landscape = np.zeros((n_replicates, size, size))
+        self.landscape_history = np.full([n_replicates, size, size], np.nan)
+        self.landscape_nutrition = np.full([n_replicates, size, size], np.nan)
+        self.protected_zone = model.build_protected_zone(policy_in_effect, config)
+
+        # Cells that may be logged and neighbor table for movement
+        self.loggable = (self.protected_zone == 0).ravel()
+        self.adjacent_cells = adjacency_table(size)
+
+        # Sets up the current timestep (the last day that has been simulated)
+        self.timestep = 0
+
+        # Puts predefined number of deer and wolves in the landscape of every replicate
+        self.deers = AgentArrays(np.repeat(np.arange(n_replicates), config.n_deers),
+                                 self.initial_positions(config.n_deers),
+                                 config.initial_fitness_deer, 1, self.timestep, config)
+        self.deer_counter = np.full(n_replicates, config.n_deers)
+
+        self.wolves = AgentArrays(np.repeat(np.arange(n_replicates), config.n_wolves),
+                                  self.initial_positions(config.n_wolves),
+                                  config.initial_fitness_wolf, mt.ceil(size/4), self.timestep, config)
+        self.wolf_counter = np.full(n_replicates, config.n_wolves)
+
+        # Sets up data collection for population dynamics, with one column per replicate
+        self.recorder = model.TimeSeriesRecorder(config.timesteps + 1, n_replicates)
+        self.recorder.add_metric('n_deer', lambda environment: environment.population_size(environment.deers), dtype = int)
+        self.recorder.add_metric('n_wolves', lambda environment: environment.population_size(environment.wolves), dtype = int)
+        self.recorder.add_metric('hr_deer', lambda environment: environment.avg_hr_size(environment.deers))
+        self.recorder.add_metric('hr_wolves', lambda environment: environment.avg_hr_size(environment.wolves))
+        self.recorder.record(self, 0)
+
+
+    def initial_positions(self, n):
+
+        # Random flat positions of n animals in every replicate, in the order of the replicates
+        return np.concatenate([streams.initialization.flat_positions(n, self.config.landscape_size) for streams in self.streams])
+
+
+    def get_pop_dynam(self, replicate):
+
+        # Population dynamics of one replicate in the same format as the object-based Environment
+        return self.recorder.to_frame(replicate)
+
+
+    def save_pop_dynam(self, folder, first_simulation = 1):
+
+        # Writes one 'pop_dynam_<i>.csv' per replicate, numbered from first_simulation
+        for replicate in range(self.n_replicates):
+            model.pop_dynam_to_csv(self.get_pop_dynam(replicate), folder + '/pop_dynam_' + str(first_simulation + replicate) + '.csv', self.config)
+
+
+    def population_size(self, agents):
+
+        return np.bincount(agents.replicate[agents.alive], minlength = self.n_replicates)
+
+
+    def avg_hr_size(self, agents):
+
+        # Average home range size per replicate (0 if the population is extinct)
+        living = agents.living()
+        counts = np.bincount(agents.replicate[living], minlength = self.n_replicates)
+        sums = np.bincount(agents.replicate[living],
+                           weights = home_range_sizes(agents.original_position[living], agents.movement_radius[living], self.config.landscape_size),
+                           minlength = self.n_replicates)
+
+        return np.divide(sums, counts, out = np.zeros(self.n_replicates), where = counts > 0)
+
+
+    def logging(self):
+
+        config = self.config
+
+        # Every replicate logs a random sample of its unlogged, unprotected cells, drawn from the cells in row-major
+        # order like in Environment.logging, so that both engines log the same cells with the same streams
+        n_cells = config.landscape_size**2
+        possible = (self.landscape.reshape(self.n_replicates, n_cells) == 0) & self.loggable
+
+        draw = np.array([cell + n_cells*replicate
+                         for replicate, streams in enumerate(self.streams)
+                         for cell in streams.logging.sample(np.flatnonzero(possible[replicate]).tolist(), config.no_cells_logged_per_month)],
+                        dtype = int)
+
+        self.landscape.ravel()[draw] = 1
+        self.landscape_history.ravel()[draw] = 0
+
+
+    def move(self, agents):
+
+        # Same movement rules as in Deer.move and Wolf.move, evaluated for all living animals at once
+        living = agents.living()
+        cell = agents.cell()[living]
+        time_spent_in_cell = agents.time_spent_in_cell[living]
+        old_growth = self.landscape.ravel()[cell] == 0
+        history = self.landscape_history.ravel()[cell]
+        seral = ~old_growth & (history < self.config.end_of_seral_forest)
+        closed_canopy = ~old_growth & (history >= self.config.end_of_seral_forest)
+
+        moving = (old_growth & (time_spent_in_cell > 2)) | seral | (closed_canopy & (time_spent_in_cell > 1))
+        staying = (old_growth | closed_canopy) & ~moving
+
+        agents.time_spent_in_cell[living[staying]] += 1
+
+        movers = living[moving]
+        if len(movers) > 0:
+            agents.position[movers] = self.cell_choice(agents, movers)
+            agents.time_spent_in_cell[movers] = 1
+
+
+    def cell_choice(self, agents, movers):
+
+        # Picks the adjacent cell in the home range that was visited longest ago (first one in case of ties)
+        size = self.config.landscape_size
+
+        candidates = self.adjacent_cells[agents.position[movers]]
+        origin_x = (agents.original_position[movers] // size)[:, None]
+        origin_y = (agents.original_position[movers] % size)[:, None]
+        radius = agents.movement_radius[movers][:, None]
+
+        in_home_range = ((candidates >= 0) & (np.abs(candidates // size - origin_x) <= radius)
+                         & (np.abs(candidates % size - origin_y) <= radius))
+
+        index = agents.memory_index(movers[:, None], np.where(in_home_range, candidates, agents.position[movers][:, None]))
+        last_visits = np.where(in_home_range, agents.visits[index], np.iinfo(np.int32).max)
+        choice = (np.arange(len(movers)), last_visits.argmin(axis = 1))
+        pick = candidates[choice]
+
+        # Registers the visit
+        agents.visits[index[choice]] = self.timestep
+
+        return pick
+
+
+    def available_food(self):
+
+        # Counts the number of deer per cell of every replicate in one pass and updates nutrition on all grids
+        deer_in_cell = np.bincount(self.deers.cell()[self.deers.alive], minlength = self.landscape.size).reshape(self.landscape.shape)
+        model.update_nutrition(self.landscape, self.landscape_history, self.landscape_nutrition, deer_in_cell, self.config)
+
+
+    def feed(self, food_factor_old_growth, food_factor_new_growth):
+
+        deers = self.deers
+        cell = deers.cell()
+        old_growth = self.landscape.ravel()[cell] == 0
+        factor = np.where(old_growth, food_factor_old_growth, food_factor_new_growth)
+        intake = np.where(deers.alive, np.minimum(self.config.max_food_gain_deer, self.landscape_nutrition.ravel()[cell]*factor), 0)
+
+        deers.fitness += intake
+        deers.feed_history[:, 0] += intake
+        deers.feed_history[:, 1] += deers.alive
+
+
+    def update_homerange(self, agents, max_radius):
+
+        # Expands the home ranges of undernourished animals around their original position and resets their spatial memory
+        living = agents.living()
+        expand = living[(agents.feed_history[living, 0]/agents.feed_history[living, 1] < 1) & (agents.movement_radius[living] < max_radius)]
+
+        agents.movement_radius[expand] += 1
+        agents.reset_memory(expand, self.timestep)
+
+
+    def predation(self):
+
+        config = self.config
+
+        wolves = self.wolves
+        deers = self.deers
+
+        # Deer sorted by cell and, within a cell, by id (the order of the deer list)
+        deer_slots = deers.living()
+        deer_cells = deers.cell()[deer_slots]
+        deer_ids = deers.id[deer_slots]
+        by_cell = np.argsort(deer_cells*(deer_ids.max(initial = 0) + 1) + deer_ids)
+        order = deer_slots[by_cell]
+        sorted_cells = deer_cells[by_cell]
+
+        # Deer in the cell of every wolf that is able to hunt (wolves in the order of the wolf list)
+        wolf_slots = wolves.in_order()
+        hunters = wolf_slots[wolves.time_since_recent_kill[wolf_slots] >= config.hunt_refresh_time]
+        hunter_cells = wolves.cell()[hunters]
+        first = np.searchsorted(sorted_cells, hunter_cells, side = 'left')
+        n_prey = np.searchsorted(sorted_cells, hunter_cells, side = 'right') - first
+
+        if n_prey.sum() > 0:
+
+            # A wolf draws for its encounters until the first success and kills that deer.
+            # Hunters are sorted by replicate, so the hunters of every replicate draw from its stream in one call.
+            bounds = np.searchsorted(wolves.replicate[hunters], np.arange(self.n_replicates + 1))
+            kill_rank = np.concatenate([streams.predation.first_successes(config.predation_efficiency, n_prey[start:stop])
+                                        for streams, start, stop in zip(self.streams, bounds[:-1], bounds[1:])])
+            successful_wolf = np.flatnonzero(kill_rank >= 0)
+
+            if len(successful_wolf) > 0:
+
+                killers = hunters[successful_wolf]
+                victims = order[first[successful_wolf] + kill_rank[successful_wolf]]
+
+                wolves.fitness[killers] += config.gain_from_deer
+                wolves.time_since_recent_kill[killers] = -1
+                wolves.feed_history[killers, 0] += config.gain_from_deer
+                deers.fitness[victims] = 0
+
+        # Adds to the counters
+        wolves.time_since_recent_kill += 1
+        wolves.feed_history[:, 1] += 1
+
+
+    def reproduction(self):
+
+        config = self.config
+
+        # Performs global reproduction for wolves and deer, offspring start in the position of the parent.
+        # Offspring are numbered in the order of their parents in the list of their replicate.
+        self.wolf_counter = self.give_birth(self.wolves, self.wolf_counter, config.wolf_birth_threshold, config.wolf_birth_loss,
+                                            config.initial_fitness_wolf, mt.ceil(config.landscape_size/4))
+        self.deer_counter = self.give_birth(self.deers, self.deer_counter, config.deer_birth_threshold, config.deer_birth_loss,
+                                            config.initial_fitness_deer, 1)
+
+
+    def give_birth(self, agents, counter, birth_threshold, birth_loss, initial_fitness, movement_radius):
+
+        # Writes one offspring per parent into the pool and returns the updated id counters
+        slots = agents.in_order()
+        parents = slots[agents.fitness[slots] > birth_threshold]
+
+        if len(parents) > 0:
+            replicate = agents.replicate[parents]
+            agents.add(replicate, counter[replicate] + rank_within_replicate(replicate), agents.position[parents],
+                       initial_fitness, movement_radius, self.timestep)
+            agents.fitness[parents] -= birth_loss
+            counter = counter + np.bincount(replicate, minlength = self.n_replicates)
+
+        return counter
+
+
+    def kill_animals(self):
+
+        config = self.config
+
+        # Decreases fitness linearly and removes dead animals (optionally skipping animals like the original list removal)
+        for agents, fitness_loss in [(self.deers, config.fitness_loss_deer), (self.wolves, config.fitness_loss_wolves)]:
+
+            if config.legacy_removal:
+                # The skipping happens within the list of each replicate, so the animals are taken in list order
+                slots = agents.in_order()
+                group_start = np.concatenate(([True], np.diff(agents.replicate[slots]) != 0))
+                processed = slots[legacy_processed_mask(agents.fitness[slots] - fitness_loss <= 0, group_start)]
+            else:
+                processed = agents.living()
+
+            agents.fitness[processed] -= fitness_loss
+            agents.remove(processed[agents.fitness[processed] <= 0])
+
+
+    def tracking_columns(self, agents, slots):
+
+        # Returns the replicate, id, position and fitness of the animals in the slots as columns for an AgentTracker
+        position = agents.position[slots]
+
+        return {'replicate': agents.replicate[slots],
+                'id': agents.id[slots],
+                'x': position//self.config.landscape_size,
+                'y': position % self.config.landscape_size,
+                'fitness': agents.fitness[slots]}
+
+
+    def track(self, tracker, timestep):
+
+        # Records the positions of the animals, in the order of the lists of the replicates
+        tracker.record(timestep, 'Deer', self.tracking_columns(self.deers, self.deers.in_order()))
+        tracker.record(timestep, 'Wolf', self.tracking_columns(self.wolves, self.wolves.in_order()))
+
+
+    def set_scenario(self, policy_in_effect, config):
+
+        # Switches to another logging intensity and policy, which only makes a difference once logging starts
+        self.config = config
+        self.policy_in_effect = policy_in_effect
+        self.protected_zone = model.build_protected_zone(policy_in_effect, config)
+        self.loggable = (self.protected_zone == 0).ravel()
+        self.deers.config = config
+        self.wolves.config = config
+
+
+    def simulation(self, until = None, profiler = model.no_profiler, tracker = no_tracker):
+
+        # Runs the days after the current timestep up to 'until' (the end of the simulation if None),
+        # recording the wall time of every phase with a PhaseProfiler (see 'ecol_1_model.py')
+        # and individual animals with an AgentTracker (see 'ecol_1_tracking.py')
+        config = self.config
+        month_ticks = config.month_ticks
+
+        if until is None:
+            until = config.timesteps
+
+        if self.timestep == 0 and tracker.tracking(0):
+            self.track(tracker, 0)
+
+        # Runs all replicates in lockstep
+        for timestep in range(self.timestep+1, until+1):
+
+            self.timestep = timestep
+            profiler.start_day(timestep)
+
+            # Registers seasonal changes and resets once one year is over
+            season_counter = (timestep - 1) % config.length_year + 1
+
+            # Registers changes to the forest
+            self.landscape_history += 1
+            profiler.lap('landscape_aging')
+
+            if timestep >= config.start_of_logging and timestep < config.stop_of_logging:
+                if season_counter in month_ticks:
+                    self.logging()
+                    profiler.lap('logging')
+
+            # Moves the animals
+            self.move(self.deers)
+            self.move(self.wolves)
+            profiler.lap('move')
+
+            # Calculates available nutrition and feeds the deer depending on season
+            self.available_food()
+            profiler.lap('available_food')
+
+            if season_counter < config.beginning_of_winter:
+                self.feed(config.summer_food_factor_old_growth, config.summer_food_factor_new_growth)
+            else:
+                self.feed(config.winter_food_factor_old_growth, config.winter_food_factor_new_growth)
+
+            # Checks for home range expansions and resets food counter every year
+            if season_counter == config.length_year:
+                self.update_homerange(self.deers, mt.floor(config.landscape_size/2))
+                self.deers.feed_history[:] = 0
+            profiler.lap('feed')
+
+            # Registers global predation
+            self.predation()
+            profiler.lap('predation')
+
+            # Updates home ranges for wolves (after predation)
+            if season_counter == config.length_year:
+                self.update_homerange(self.wolves, config.landscape_size - 1)
+                self.wolves.feed_history[:] = 0
+            profiler.lap('update_homerange')
+
+            # Registers global reproduction (newborns have ids from the counters before reproduction)
+            deer_counter, wolf_counter = self.deer_counter, self.wolf_counter
+            self.reproduction()
+            if tracker.events:
+                for species, agents, counter in [('Deer', self.deers, deer_counter), ('Wolf', self.wolves, wolf_counter)]:
+                    slots = agents.in_order()
+                    tracker.event(timestep, species, 'birth',
+                                  self.tracking_columns(agents, slots[agents.id[slots] >= counter[agents.replicate[slots]]]))
+            profiler.lap('reproduction')
+
+            # Eliminates dead animals (removed animals keep their data until their slot is reused)
+            if tracker.events:
+                deer_slots, wolf_slots = self.deers.in_order(), self.wolves.in_order()
+            self.kill_animals()
+            if tracker.events:
+                for species, agents, slots in [('Deer', self.deers, deer_slots), ('Wolf', self.wolves, wolf_slots)]:
+                    tracker.event(timestep, species, 'death', self.tracking_columns(agents, slots[~agents.alive[slots]]))
+            profiler.lap('kill_animals')
+
+            # Updates tracking tables
+            self.recorder.record(self, timestep)
+            if tracker.tracking(timestep):
+                self.track(tracker, timestep)
+            profiler.lap('recording')
+            profiler.end_day(self)
+
+
+
+class VectorizedEnvironment(BatchedEnvironment):
+
+    # A single replicate, used like the object-based Environment
+
+    def __init__(self, policy_in_effect, config = model.default_config, streams = model.global_streams):
+        super().__init__(policy_in_effect, 1, config, [streams])
+
+
+    @property
+    def pop_dynam(self):
+
+        # Population dynamics in the same format as the object-based Environment
+        return self.get_pop_dynam(0)
+
+
+#------------------------------------------------------------------------------
+
+# ONE SIMULATION (for a quick glance)
+
+if __name__ == '__main__':
+
+    start_time = time.time()
+    environment = VectorizedEnvironment(policy_in_effect = True)
+    environment.simulation()
+    print("--- %s seconds ---" % (time.time() - start_time))
+
+    # A batch of replicates advanced together
+    start_time = time.time()
+    batch = BatchedEnvironment(policy_in_effect = True, n_replicates = 50)
+    batch.simulation()
+    print("--- %s seconds for %s replicates ---" % (time.time() - start_time, batch.n_replicates))
@@ -0,0 +1,158 @@
+# RESULT STORE FOR THE WOLF-DEER-MODEL IN LOGGED FOREST
+
+# Author: Peter Kamal
+# Python version: 3.9.13
+# Last update: 17/10/26
+
+# Note: Instead of one 'pop_dynam_<i>.csv' per simulation, the population dynamics of a whole sweep can be collected
+# in one compressed Parquet file. Every row holds one timestep of one simulation and is keyed by
+# scenario, parameter (logging intensity), version and replicate.
+# Simulations are buffered and written in batches (one row group per batch), so workers never wait for the disk.
+# Parquet keeps each column and each row group separately, so one replicate or one metric can be read without parsing the rest.
+# Requires pyarrow ('pip install pyarrow'), which is only needed for this file.
+
+#------------------------------------------------------------------------------
+
+# IMPORTS
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+#------------------------------------------------------------------------------
+
+# LAYOUT
+
+# Columns that identify one simulation and the metrics recorded for every timestep (as in the population dynamics files)
+keys = ['scenario', 'parameter', 'version', 'replicate']
+metrics = ['n_deer', 'n_wolves', 'hr_deer', 'hr_wolves']
+
+
+# Function that raises a clear error if pyarrow is missing (also used by 'ecol_1_tracking.py'),
+# naming the feature that needs it and, if there is one, what to use instead
+def require_pyarrow(feature = 'The result store', alternative = None):
+    if pa is None:
+        raise ImportError(feature + " requires pyarrow ('pip install pyarrow')" + (', use ' + alternative + ' instead' if alternative else ''))
+
+
+# Function that returns the schema of a result file
+def result_schema():
+
+    require_pyarrow()
+
+    return pa.schema([('scenario', pa.string()),
+                      ('parameter', pa.int64()),
+                      ('version', pa.int64()),
+                      ('replicate', pa.int64()),
+                      ('timestep', pa.int64()),
+                      ('n_deer', pa.int64()),
+                      ('n_wolves', pa.int64()),
+                      ('hr_deer', pa.float64()),
+                      ('hr_wolves', pa.float64())])
+
+
+# Function that turns keyword arguments into Parquet filters on the keys (keys that are None are not filtered)
+def key_filters(**values):
+
+    filters = [(key, '=', value) for key, value in values.items() if value is not None]
+
+    return filters if filters else None
+
+
+#------------------------------------------------------------------------------
+
+# WRITER
+
+class ResultWriter:
+
+    # Collects the population dynamics of many simulations and appends them to one Parquet file in batches.
+    # Use as a context manager around a sweep, so that the last batch is written and the file is closed:
+    # with ResultWriter('output/sweep_v1.parquet') as store:
+    #     run_ensemble(..., store = store)
+
+    def __init__(self, path, batch_size = 100, compression = 'zstd'):
+
+        require_pyarrow()
+
+        self.path = path
+        self.batch_size = batch_size
+        self.schema = result_schema()
+        self.writer = pq.ParquetWriter(path, self.schema, compression = compression)
+        self.buffer = []
+
+
+    def add(self, pop_dynam, scenario, parameter, version, replicate):
+
+        # Buffers the population dynamics of one simulation and writes a batch once enough simulations are buffered
+        n = len(pop_dynam)
+        columns = {'scenario': np.full(n, scenario, dtype = object),
+                   'parameter': np.full(n, parameter, dtype = np.int64),
+                   'version': np.full(n, version, dtype = np.int64),
+                   'replicate': np.full(n, replicate, dtype = np.int64),
+                   'timestep': np.asarray(pop_dynam['timestep'], dtype = np.int64)}
+        for metric in metrics:
+            columns[metric] = np.asarray(pop_dynam[metric])
+
+        self.buffer.append(columns)
+
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+
+    def flush(self):
+
+        # Writes all buffered simulations as one row group
+        if not self.buffer:
+            return
+
+        table = pa.table({name: np.concatenate([columns[name] for columns in self.buffer]) for name in self.schema.names},
+                         schema = self.schema)
+        self.writer.write_table(table, row_group_size = table.num_rows)
+        self.buffer = []
+
+
+    def close(self):
+
+        self.flush()
+        self.writer.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+#------------------------------------------------------------------------------
+
+# READERS
+
+def read_replicate(path, scenario, parameter, version, replicate):
+
+    # Returns the population dynamics of one simulation in the same format as a 'pop_dynam_<i>.csv' file
+    require_pyarrow()
+
+    table = pq.read_table(path, columns = ['timestep'] + metrics,
+                          filters = key_filters(scenario = scenario, parameter = parameter, version = version, replicate = replicate))
+
+    return table.to_pandas()
+
+
+def read_metric(path, metric, scenario = None, parameter = None, version = None):
+
+    # Returns one metric for all matching simulations, with one row per simulation and timestep
+    require_pyarrow()
+
+    if metric not in metrics:
+        raise ValueError('metric must be one of ' + ', '.join(metrics))
+
+    table = pq.read_table(path, columns = keys + ['timestep', metric],
+                          filters = key_filters(scenario = scenario, parameter = parameter, version = version))
+
+    return table.to_pandas()
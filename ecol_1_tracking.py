@@ -0,0 +1,260 @@
+# INDIVIDUAL TRACKING FOR THE WOLF-DEER-MODEL IN LOGGED FOREST
+
+# Author: Peter Kamal
+# Python version: 3.9.13
+# Last update: 17/10/26
+
+# Note: This script records the trajectories of individual animals (timestep, id, position and fitness) and their
+# births and deaths. It replaces the tracking tables that were commented out in 'ecol_1_model.py' because they
+# concatenated a DataFrame for every animal every day. Here, rows are appended to preallocated columnar buffers and
+# every full chunk is written to disk, either as a Parquet file (one row group per chunk, requires pyarrow) or as one
+# raw file per column that is read back as a memory map. The memory use is bounded by the chunk size.
+# To keep the output small across whole ensembles, positions can be recorded only every k days and only for a
+# fraction of the animals. The sample is drawn by hashing the id of an animal, so it is the same in every process
+# and an animal is followed from birth to death.
+# A tracker is passed to 'simulation' of both engines, e.g.
+# with AgentTracker('output/tracking_1', every = 30, fraction = 0.1) as tracker:
+#     environment.simulation(tracker = tracker)
+
+#------------------------------------------------------------------------------
+
+# IMPORTS
+import os
+import json
+import numpy as np
+import pandas as pd
+from ecol_1_results import pa, pq, require_pyarrow
+
+#------------------------------------------------------------------------------
+
+# LAYOUT
+
+# Columns of the trajectories and of the birth and death events. Species and events are stored as codes.
+track_columns = {'timestep': np.int64, 'replicate': np.int64, 'species': np.int8, 'id': np.int64,
+                 'x': np.int64, 'y': np.int64, 'fitness': np.float64}
+event_columns = dict(track_columns, event = np.int8)
+
+species_codes = {'Deer': 0, 'Wolf': 1}
+event_codes = {'birth': 0, 'death': 1}
+
+
+# Function that decides for every id whether the animal is followed: a fixed hash of the id and the species
+# (splitmix64) is mapped to [0, 1) and compared with the fraction, so that the sample is the same in every run
+def sampled(ids, species, fraction):
+
+    if fraction >= 1:
+        return np.ones(len(ids), dtype = bool)
+
+    with np.errstate(over = 'ignore'):
+        z = np.asarray(ids, dtype = np.uint64) + np.uint64(species_codes[species] + 1)*np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30)))*np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27)))*np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+
+    return (z >> np.uint64(11)).astype(np.float64)/2.0**53 < fraction
+
+
+#------------------------------------------------------------------------------
+
+# STORAGE
+
+class ParquetSink:
+
+    # Appends chunks to a Parquet file, one row group per chunk
+
+    def __init__(self, path, columns, compression = 'zstd'):
+
+        require_pyarrow('Parquet tracking', "file_format = 'memmap'")
+
+        self.schema = pa.schema([(name, pa.from_numpy_dtype(dtype)) for name, dtype in columns.items()])
+        self.writer = pq.ParquetWriter(path + '.parquet', self.schema, compression = compression)
+
+
+    def write(self, columns):
+        self.writer.write_table(pa.table(columns, schema = self.schema))
+
+
+    def close(self):
+        self.writer.close()
+
+
+class MemmapSink:
+
+    # Appends chunks to one raw file per column in a folder, together with the dtypes of the columns.
+    # The files are read back without copying with 'read_memmap'.
+
+    def __init__(self, path, columns):
+
+        os.makedirs(path, exist_ok = True)
+        with open(os.path.join(path, 'columns.json'), 'w') as file:
+            json.dump({name: np.dtype(dtype).str for name, dtype in columns.items()}, file)
+
+        self.files = {name: open(os.path.join(path, name + '.bin'), 'wb') for name in columns}
+
+
+    def write(self, columns):
+        for name, file in self.files.items():
+            columns[name].tofile(file)
+
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+
+
+class ColumnBuffer:
+
+    # Preallocated arrays for chunk_size rows. Appending copies the new rows into the arrays, a full chunk is
+    # handed to the sink and the arrays are reused.
+
+    def __init__(self, columns, sink, chunk_size):
+
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.columns = {name: np.zeros(chunk_size, dtype = dtype) for name, dtype in columns.items()}
+        self.n_rows = 0
+
+
+    def append(self, **values):
+
+        # Values are arrays of equal length or scalars (the same for every row)
+        n = max((len(value) for value in values.values() if np.ndim(value) > 0), default = 0)
+        start = 0
+
+        while start < n:
+            stop = min(n, start + self.chunk_size - self.n_rows)
+            for name, column in self.columns.items():
+                value = values[name]
+                column[self.n_rows:self.n_rows + stop - start] = value[start:stop] if np.ndim(value) > 0 else value
+            self.n_rows += stop - start
+            start = stop
+            if self.n_rows == self.chunk_size:
+                self.flush()
+
+
+    def flush(self):
+
+        if self.n_rows > 0:
+            self.sink.write({name: column[:self.n_rows] for name, column in self.columns.items()})
+            self.n_rows = 0
+
+
+    def close(self):
+
+        self.flush()
+        self.sink.close()
+
+
+#------------------------------------------------------------------------------
+
+# TRACKER
+
+class AgentTracker:
+
+    # Records the positions and fitness of the followed animals every 'every' days (and on day 0), and their births
+    # and deaths, in the folder 'path' ('tracks' and 'events'). fraction is the share of animals that is followed,
+    # file_format is 'parquet' or 'memmap'. Use as a context manager, so that the last chunk is written and the files are closed.
+    # The engines pass the animals as columns (replicate, id, x, y, fitness), see 'tracking_columns' in both engines.
+
+    def __init__(self, path, every = 1, fraction = 1.0, chunk_size = 2**16, file_format = 'parquet', events = True):
+
+        if file_format not in ['parquet', 'memmap']:
+            raise ValueError("file_format must be 'parquet' or 'memmap'")
+
+        sink = ParquetSink if file_format == 'parquet' else MemmapSink
+        os.makedirs(path, exist_ok = True)
+
+        self.path = path
+        self.every = every
+        self.fraction = fraction
+        self.events = events
+        self.tracks = ColumnBuffer(track_columns, sink(os.path.join(path, 'tracks'), track_columns), chunk_size)
+        self.event_buffer = ColumnBuffer(event_columns, sink(os.path.join(path, 'events'), event_columns), chunk_size) if events else None
+
+
+    def tracking(self, timestep):
+        return timestep % self.every == 0
+
+
+    def record(self, timestep, species, columns):
+
+        # Appends the followed animals to the trajectories
+        keep = sampled(columns['id'], species, self.fraction)
+        self.tracks.append(timestep = timestep, species = species_codes[species],
+                           **{name: np.asarray(column)[keep] for name, column in columns.items()})
+
+
+    def event(self, timestep, species, event, columns):
+
+        # Appends the births or deaths of the followed animals
+        keep = sampled(columns['id'], species, self.fraction)
+        self.event_buffer.append(timestep = timestep, species = species_codes[species], event = event_codes[event],
+                                 **{name: np.asarray(column)[keep] for name, column in columns.items()})
+
+
+    def close(self):
+
+        self.tracks.close()
+        if self.events:
+            self.event_buffer.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class NoTracker:
+
+    # Default of 'simulation': nothing is tracked and the engines skip collecting the columns
+
+    events = False
+
+    def tracking(self, timestep):
+        return False
+
+
+no_tracker = NoTracker()
+
+
+#------------------------------------------------------------------------------
+
+# READERS
+
+def read_memmap(path):
+
+    # Returns the columns written by a MemmapSink as a dictionary of read-only memory maps
+    with open(os.path.join(path, 'columns.json')) as file:
+        dtypes = json.load(file)
+
+    return {name: np.memmap(os.path.join(path, name + '.bin'), dtype = np.dtype(dtype), mode = 'r')
+            if os.path.getsize(os.path.join(path, name + '.bin')) > 0 else np.zeros(0, dtype = np.dtype(dtype))
+            for name, dtype in dtypes.items()}
+
+
+def read_table(path, name):
+
+    # Returns the trajectories ('tracks') or events ('events') of a tracking folder as a DataFrame,
+    # with the species and events as names
+    if os.path.exists(os.path.join(path, name + '.parquet')):
+        require_pyarrow('Parquet tracking')
+        table = pq.read_table(os.path.join(path, name + '.parquet')).to_pandas()
+    else:
+        table = pd.DataFrame({column: np.asarray(values) for column, values in read_memmap(os.path.join(path, name)).items()})
+
+    table['species'] = table['species'].map({code: species for species, code in species_codes.items()})
+    if 'event' in table:
+        table['event'] = table['event'].map({code: event for event, code in event_codes.items()})
+
+    return table
+
+
+def read_tracks(path):
+    return read_table(path, 'tracks')
+
+
+def read_events(path):
+    return read_table(path, 'events')
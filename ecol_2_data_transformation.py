@@ -13,14 +13,47 @@
 
 import pandas as pd
 import os
-
-os.chdir('C:/Users/Kamal/OneDrive/TSE/M2 EE/thesis/ecol/model/output/')
+from concurrent.futures import ThreadPoolExecutor
 
 #------------------------------------------------------------------------------
 
 # FUNCTIONS TO TRANSFORM THE MANY DATASETS GENERATED IN THE MAIN SCRIPT INTO SINGLE ONES
 
-def create_pop_dynam(scenario,n_simulations,version,parameter):
+# Function that reads one population dynamics file and names its columns after the simulation
+def read_pop_dynam(path, label):
+    
+    data = pd.read_csv(path)
+    data.columns = ['timestep', 'n_Deer_' + label, 'n_Wolves_' + label, 'hr_Deer_' + label, 'hr_Wolves_' + label]
+    
+    return data
+
+
+# Function that reads many population dynamics files concurrently and places them side by side in one table.
+# All files of a batch share the same timesteps, so the table is assembled once from the columns of all files
+# instead of growing it with one merge per file.
+def merge_pop_dynam(paths, labels, n_workers = None):
+    
+    with ThreadPoolExecutor(max_workers = n_workers) as pool:
+        tables = list(pool.map(read_pop_dynam, paths, labels))
+    
+    timestep = tables[0]['timestep']
+    
+    if all(table['timestep'].equals(timestep) for table in tables):
+        columns = {'timestep': timestep.values}
+        for table in tables:
+            for name in table.columns[1:]:
+                columns[name] = table[name].values
+        return pd.DataFrame(columns)
+    
+    # Files with different timesteps are joined one by one on the common timesteps
+    data = tables[0]
+    for table in tables[1:]:
+        data = pd.merge(data, table, on='timestep')
+        
+    return data
+
+
+def create_pop_dynam(scenario,n_simulations,version,parameter,n_workers = None):
     
     # This is a function that imports all the relevant population dynamics datasets, merges them, and exports them.
     # Input one of four scenarios: 
@@ -29,65 +62,51 @@ def create_pop_dynam(scenario,n_simulations,version,parameter):
     # 3. protection_full (both unprotected and protected forest at a specific logging intensity), 
     # 4. deer_only (deer absent predatory pressure under unprotected logging)
     # Also input the number of simulations, the version and the logging parameter.
+    # The files are read by a pool of n_workers threads (chosen by Python if None).
     
-    if scenario == 'logging_intensity':
-    
-        data = pd.read_csv(scenario+'/v'+str(version)+'/'+str(parameter)+'/pop_dynam_1.csv')
-        data.columns = ['timestep', 'n_Deer_1', 'n_Wolves_1', 'hr_Deer_1', 'hr_Wolves_1']
+    simulations = [str(i) for i in range(1,n_simulations + 1)]
     
-        for i in range(2,n_simulations + 1):
-            addon = pd.read_csv(scenario+'/v'+str(version)+'/'+str(parameter)+'/pop_dynam_'+str(i)+'.csv')
-            addon.columns = ['timestep', 'n_Deer_' + str(i), 'n_Wolves_' + str(i), 'hr_Deer_'+str(i), 'hr_Wolves_'+str(i)]
-            data = pd.merge(data, addon, on='timestep')
-            
+    if scenario == 'logging_intensity':
+        
+        paths = [scenario+'/v'+str(version)+'/'+str(parameter)+'/pop_dynam_'+i+'.csv' for i in simulations]
+        data = merge_pop_dynam(paths, simulations, n_workers)
         data.to_csv(scenario+'/v'+str(version)+'/pop_dynam_full_log_int_'+str(parameter)+'_v'+str(version)+'.csv', index=False)
         
     elif scenario == 'protection_only':
         
-        data = pd.read_csv('protection/v' + str(version) + '/' + str(parameter) + '/pop_dynam_1.csv')
-        data.columns = ['timestep', 'n_Deer_1', 'n_Wolves_1', 'hr_Deer_1', 'hr_Wolves_1']
-        
-        for i in range(2,n_simulations + 1):
-            addon = pd.read_csv('protection/v' + str(version) + '/' + str(parameter) + '/pop_dynam_'+str(i)+'.csv')
-            addon.columns = ['timestep', 'n_Deer_' + str(i), 'n_Wolves_' + str(i), 'hr_Deer_'+str(i), 'hr_Wolves_'+str(i)]
-            data = pd.merge(data, addon, on='timestep')
-            
+        paths = ['protection/v' + str(version) + '/' + str(parameter) + '/pop_dynam_'+i+'.csv' for i in simulations]
+        data = merge_pop_dynam(paths, simulations, n_workers)
         data.to_csv('protection/v' + str(version) + '/pop_dynam_only_prot_'+str(parameter)+'_v'+ str(version) +'.csv',index = False)
 
     
     elif scenario == 'protection_full':
         
-        data = pd.read_csv('logging_intensity/v' + str(version) + '/' + str(parameter) + '/pop_dynam_1.csv')
-        data.columns = ['timestep', 'n_Deer_unprotected_1', 'n_Wolves_unprotected_1', 'hr_Deer_unprotected_1', 'hr_Wolves_unprotected_1']
-        addon = pd.read_csv('protection/v' + str(version) + '/' + str(parameter) + '/pop_dynam_1.csv')
-        addon.columns = ['timestep', 'n_Deer_protected_1', 'n_Wolves_protected_1', 'hr_Deer_protected_1', 'hr_Wolves_protected_1']
-        data = pd.merge(data,addon, on = 'timestep')
-
-
-        for i in range(2,n_simulations + 1):
-            addon = pd.read_csv('logging_intensity/v' + str(version) + '/' + str(parameter) + '/pop_dynam_'+str(i)+'.csv')
-            addon.columns = ['timestep', 'n_Deer_unprotected_' + str(i), 'n_Wolves_unprotected_' + str(i), 'hr_Deer_unprotected_' + str(i), 'hr_Wolves_unprotected_' + str(i)]
-            data = pd.merge(data, addon, on='timestep')
-            addon = pd.read_csv('protection/v' + str(version) + '/' + str(parameter) + '/pop_dynam_' + str(i) + '.csv')
-            addon.columns = ['timestep', 'n_Deer_protected_' + str(i), 'n_Wolves_protected_' + str(i), 'hr_Deer_protected_' + str(i), 'hr_Wolves_protected_' + str(i)]
-            data = pd.merge(data, addon, on='timestep')
-            
+        # Unprotected and protected simulations alternate
+        paths = []
+        labels = []
+        for i in simulations:
+            paths += ['logging_intensity/v' + str(version) + '/' + str(parameter) + '/pop_dynam_'+i+'.csv',
+                      'protection/v' + str(version) + '/' + str(parameter) + '/pop_dynam_' + i + '.csv']
+            labels += ['unprotected_' + i, 'protected_' + i]
+        
+        data = merge_pop_dynam(paths, labels, n_workers)
         data.to_csv('protection/v' + str(version) + '/pop_dynam_full_prot_'+str(parameter)+'_v'+ str(version) +'.csv',index = False)
     
     elif scenario == 'deer_only':
         
-        data = pd.read_csv(scenario+'/v'+str(version)+'/pop_dynam_1.csv')
-        data.columns = ['timestep', 'n_Deer_1', 'n_Wolves_1', 'hr_Deer_1', 'hr_Wolves_1']
-    
-        for i in range(2,n_simulations + 1):
-            addon = pd.read_csv(scenario+'/v'+str(version)+'/pop_dynam_'+str(i)+'.csv')
-            addon.columns = ['timestep', 'n_Deer_' + str(i), 'n_Wolves_' + str(i), 'hr_Deer_' + str(i), 'hr_Wolves_' + str(i)]
-            data = pd.merge(data, addon, on='timestep')
-            
+        paths = [scenario+'/v'+str(version)+'/pop_dynam_'+i+'.csv' for i in simulations]
+        data = merge_pop_dynam(paths, simulations, n_workers)
         data.to_csv(scenario+'/pop_dynam_full_'+scenario+'_'+str(parameter)+'_v'+str(version)+'.csv', index=False)
         
 
 #------------------------------------------------------------------------------
 
 # EXECUTE 
-# create_pop_dynam(scenario = 'logging_intensity',n_simulations = 1000, version = 1, parameter = 1)
+
+# Only changes into the output folder when the script is executed directly, so that other scripts can import it
+
+if __name__ == '__main__':
+
+    os.chdir('C:/Users/Kamal/OneDrive/TSE/M2 EE/thesis/ecol/model/output/')
+
+    # create_pop_dynam(scenario = 'logging_intensity',n_simulations = 1000, version = 1, parameter = 1)
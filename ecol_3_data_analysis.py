@@ -5,6 +5,12 @@
 # Last update: 05/09/23
 
 # Note: This takes the full data sets generated from 'ecol_2_data_transformation.py' and produces the graphs for the paper.
+# The graphs of daily population dynamics can be drawn in an aggregated mode that computes the daily mean and
+# standard deviation directly from the wide data, chunk by chunk, instead of reshaping it for seaborn.
+# The summary graphs draw from a summary cube (one value per scenario, parameter, simulation and metric) that is built
+# once from the full data sets, cached in '+cache' and rebuilt whenever one of the full data sets changes.
+# For paired runs (both logging scenarios simulated with the same random numbers per simulation), the differences
+# between the scenarios are estimated simulation by simulation, which needs far fewer simulations for the same precision.
 # Graphs can be produced with titles and notes, this part is commented out.
 
 #------------------------------------------------------------------------------
@@ -15,10 +21,10 @@ import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 from statistics import mean
+from fractions import Fraction
+import hashlib
 import os
 
-os.chdir('C:/Users/Kamal/OneDrive/TSE/M2 EE/thesis/ecol/model/output/')
-
 #------------------------------------------------------------------------------
 
 # GLOBAL PARAMETERS
@@ -31,16 +37,93 @@ end_of_seral_forest = 4*length_year
 
 # GLOBAL FUNCTIONS TO CALCULATE STATS
 
+# The statistics work on a (timestep x simulation) matrix, e.g. data.filter(regex = 'n_Wolves').to_numpy().
+# Means are exact like statistics.mean: the sum of every column is taken exactly and rounded only once.
+
+def exact_column_sums(matrix, mask):
+    
+    # Function returns the exact sum of every column over the entries where mask is True (as Python integers or fractions).
+    # Floats are written as integer mantissas on the smallest exponent of their column and summed as integers.
+    # Columns that cannot be summed this way (non-finite values or very different magnitudes) are None.
+    # Without rows (e.g. a cutoff after the last timestep), every column sums to 0.
+    
+    if matrix.shape[0] == 0:
+        return [0]*matrix.shape[1]
+    
+    if np.issubdtype(matrix.dtype, np.integer):
+        return [int(total) for total in np.where(mask, matrix, 0).sum(axis = 0, dtype = np.int64)]
+    
+    values = np.where(mask, matrix, 0.0)
+    finite = np.isfinite(values).all(axis = 0)
+    
+    mantissa, exponent = np.frexp(np.where(np.isfinite(values), values, 0.0))
+    mantissa = (mantissa*2.0**53).astype(np.int64)
+    exponent = np.where(mantissa != 0, exponent.astype(np.int64) - 53, np.iinfo(np.int64).max)
+    
+    lowest = exponent.min(axis = 0)
+    shift = np.where(mantissa != 0, exponent - lowest, 0)
+    
+    sums = []
+    for column in range(matrix.shape[1]):
+        
+        if not finite[column] or shift[:, column].max() > 10:
+            sums.append(None)
+        elif not (mantissa[:, column] != 0).any():
+            sums.append(0)
+        else:
+            # Splits the shifted mantissas (below 2**63) in two parts so that the column sums cannot overflow
+            shifted = mantissa[:, column] << shift[:, column]
+            total = (int((shifted >> 31).sum()) << 31) + int((shifted & (2**31 - 1)).sum())
+            sums.append(Fraction(total)*Fraction(2)**int(lowest[column]))
+        
+    return sums
+
+
+def column_means(matrix, mask = None):
+    
+    # Function calculates the mean of every column (over the entries where mask is True) exactly as statistics.mean would:
+    # integers if the mean of an integer column is whole, floats otherwise, and NaN for columns without entries.
+    
+    matrix = np.asarray(matrix)
+    if mask is None:
+        mask = np.ones(matrix.shape, dtype = bool)
+    
+    counts = mask.sum(axis = 0)
+    means = []
+    
+    for column, (total, count) in enumerate(zip(exact_column_sums(matrix, mask), counts)):
+        if count == 0:
+            means.append(np.nan)
+        elif total is None:
+            means.append(mean(matrix[mask[:, column], column].tolist()))
+        elif isinstance(total, int) and total % count == 0:
+            means.append(total // int(count))
+        else:
+            means.append(float(Fraction(total)/int(count)))
+            
+    return means
+
+
+def extinction_flags(matrix):
+    
+    # Function flags the simulations (columns) in which the population reached 0
+    
+    return (np.asarray(matrix) == 0).any(axis = 0)
+
+
+def first_zero_rows(matrix):
+    
+    # Function returns the row of the first 0 in every column (0 for columns without any)
+    
+    return (np.asarray(matrix) == 0).argmax(axis = 0)
+
+
 def calculate_extinction_rate(data, animal, n_simulations):
     
     # Function calculates percentage of simulations in which a population went extinct
     # Takes a dataset in wide format, and 'Wolves' or 'Deer' as input.
 
-    subset = data.filter(regex = 'n_'+animal)
-    extinction_counter = 0
-    for column in subset:
-        if 0 in subset[column].unique():
-            extinction_counter += 1
+    extinction_counter = int(extinction_flags(data.filter(regex = 'n_'+animal).to_numpy()).sum())
             
     return round((extinction_counter/n_simulations)*100,1)
 
@@ -52,10 +135,7 @@ def calculate_mean_pop_size(data, animal, cutoff):
     
     subset = (data.loc[data.timestep >= cutoff]).filter(regex = 'n_'+animal)
 
-    means_per_sim = []
-
-    for column in subset:
-        means_per_sim.append(mean(subset[column]))
+    means_per_sim = column_means(subset.to_numpy())
     
     return mean(means_per_sim)
 
@@ -65,17 +145,9 @@ def calculate_mean_hr_size(data, animal, cutoff):
     # Function calculates mean home range sizes per animal post a cutoff
     # Takes wide format data and strings for the animal names
     
-    subset = (data.loc[data.timestep >= cutoff]).filter(regex = 'hr_'+animal)
+    subset = (data.loc[data.timestep >= cutoff]).filter(regex = 'hr_'+animal).to_numpy()
 
-    means_per_sim = []
-    
-    for column in subset:
-        
-        unfiltered = subset[column]
-        filtered = [i for i in unfiltered if i != 0]
-        
-        if len(filtered) > 0:
-            means_per_sim.append(mean(filtered))
+    means_per_sim = [value for value in column_means(subset, subset != 0) if not np.isnan(value)]
         
     if len(means_per_sim) > 10:
         return mean(means_per_sim)
@@ -86,49 +158,252 @@ def calculate_extinction_timing(data, animal):
     
     # Function calculates the timing in days of an extinction given a wide-format data set
     
-    subset = data.filter(regex='n_'+animal)
-    timing = []
-    for column in subset:
-        if 0 in subset[column].unique():
-            index = (subset[column] == 0).idxmax()
-            timing.append(index)
-        else:
-            timing.append(np.nan)
+    subset = data.filter(regex='n_'+animal).to_numpy()
+    extinct = extinction_flags(subset)
+    first_zero = first_zero_rows(subset)
+    
+    timing = [data.index[row] if flag else np.nan for row, flag in zip(first_zero, extinct)]
     
     return timing
         
 
-def mean_excluding_zero(vec):
+
+
+#------------------------------------------------------------------------------
+
+# SUMMARY CUBE
+
+# Metrics per simulation: post-equilibrium mean population and home range sizes (home ranges excluding zeros),
+# whether the population went extinct (1/0) and the day of the extinction (NaN if none)
+summary_metrics = ['n_Deer', 'n_Wolves', 'hr_Deer', 'hr_Wolves',
+                   'extinct_Deer', 'extinct_Wolves', 'extinction_timing_Deer', 'extinction_timing_Wolves']
+
+# Logging scenarios in the cube and the full data sets they are built from
+summary_scenarios = {'Scattered': 'logging_intensity/v{version}/pop_dynam_full_log_int_{parameter}_v{version}.csv',
+                     'Targeted': 'protection/v{version}/pop_dynam_only_prot_{parameter}_v{version}.csv'}
+
+
+def summarize_pop_dynam(data, post_eq_time):
     
-    # Function calculates the mean of a vector including elements that are 0
+    # Function calculates the summary metrics of every simulation in a wide-format data set
+    # Returns the simulation numbers and an array with one row per simulation and one column per metric
     
-    nonzero = [elem for elem in vec if elem != 0]
-    if len(nonzero) > 0:
-        return sum(nonzero) / len(nonzero)
-    else:
-        return np.nan
+    timestep = data.timestep.to_numpy()
+    post_eq = timestep >= post_eq_time
+    columns = {}
+    
+    for animal in ['Deer', 'Wolves']:
+        
+        n = data.filter(regex = 'n_'+animal).to_numpy()
+        hr = data.filter(regex = 'hr_'+animal).to_numpy(dtype = float)[post_eq]
+        
+        columns['n_'+animal] = np.array(column_means(n[post_eq]), dtype = float)
+        columns['hr_'+animal] = np.array(column_means(hr, hr != 0), dtype = float)
+        
+        extinct = extinction_flags(n)
+        columns['extinct_'+animal] = extinct.astype(float)
+        columns['extinction_timing_'+animal] = np.where(extinct, timestep[first_zero_rows(n)], np.nan)
+    
+    simulations = [int(column.rsplit('_', 1)[1]) for column in data.filter(regex = 'n_Deer').columns]
+    
+    return simulations, np.column_stack([columns[metric] for metric in summary_metrics])
+
+
+def summary_sources(parameters_unprotected, parameters_protected, version):
+    
+    # Function lists the full data sets (scenario, parameter, path) that go into the summary cube
+    
+    sources = []
+    for scenario, parameters in zip(summary_scenarios, [parameters_unprotected, parameters_protected]):
+        for parameter in parameters:
+            sources.append((scenario, parameter, summary_scenarios[scenario].format(version = version, parameter = parameter)))
+            
+    return sources
+
+
+def build_summary_cube(parameters_unprotected, parameters_protected, version, post_eq_time):
+    
+    # Function reads every full data set once and builds the cube (scenario x parameter x simulation x metric).
+    # Combinations that were not simulated are NaN.
+    
+    sources = summary_sources(parameters_unprotected, parameters_protected, version)
+    parameters = sorted(set(parameters_unprotected) | set(parameters_protected))
+    
+    summaries = {}
+    for scenario, parameter, path in sources:
+        summaries[(scenario, parameter)] = summarize_pop_dynam(pd.read_csv(path), post_eq_time)
+        
+    n_simulations = max(max(simulations) for simulations, values in summaries.values())
+    values = np.full((len(summary_scenarios), len(parameters), n_simulations, len(summary_metrics)), np.nan)
+    
+    for (scenario, parameter), (simulations, summary) in summaries.items():
+        values[list(summary_scenarios).index(scenario), parameters.index(parameter), np.array(simulations) - 1] = summary
+    
+    return {'values': values,
+            'scenarios': np.array(list(summary_scenarios)),
+            'parameters': np.array(parameters),
+            'simulations': np.arange(1, n_simulations + 1),
+            'metrics': np.array(summary_metrics)}
 
 
+def load_summary_cube(parameters_unprotected, parameters_protected, version, post_eq_time, cache_folder = '+cache'):
+    
+    # Function returns the summary cube from the cache, or builds and caches it if it is missing or
+    # if any of the full data sets has been changed (size or modification time) since it was built.
+    
+    paths = [path for scenario, parameter, path in summary_sources(parameters_unprotected, parameters_protected, version)]
+    signature = np.array([[os.stat(path).st_size, os.stat(path).st_mtime_ns] for path in paths], dtype = np.int64)
+    
+    key = repr((version, post_eq_time, list(parameters_unprotected), list(parameters_protected)))
+    cache = cache_folder + '/summary_cube_v' + str(version) + '_' + hashlib.sha1(key.encode()).hexdigest()[:10] + '.npz'
+    
+    if os.path.exists(cache):
+        with np.load(cache) as cached:
+            if list(cached['sources']) == paths and np.array_equal(cached['signature'], signature):
+                return {name: cached[name] for name in ['values', 'scenarios', 'parameters', 'simulations', 'metrics']}
+    
+    cube = build_summary_cube(parameters_unprotected, parameters_protected, version, post_eq_time)
+    
+    os.makedirs(cache_folder, exist_ok = True)
+    np.savez(cache, sources = np.array(paths), signature = signature, **cube)
+    
+    return cube
+
+
+def cube_to_frame(cube):
+    
+    # Function returns the cube in long format with one row per scenario ('Logging'), parameter ('Logging pressure')
+    # and simulation ('sim'), and one column per metric. Combinations that were not simulated are left out.
+    
+    values = cube['values']
+    index = pd.MultiIndex.from_product([cube['scenarios'], cube['parameters'], cube['simulations']],
+                                       names = ['Logging', 'Logging pressure', 'sim'])
+    frame = pd.DataFrame(values.reshape(-1, values.shape[-1]), index = index, columns = cube['metrics'])
+    
+    return frame.dropna(how = 'all').reset_index()
+
+
+#------------------------------------------------------------------------------
+
+# PAIRED COMPARISONS
+
+# With 'paired = True' in 'ecol_1_ensemble.py', simulation i of both logging scenarios starts with the same animals and
+# draws from the same random number streams, so most of the noise between simulations cancels out in the difference
+# Targeted - Scattered of the same simulation. Only simulations that have a value in both scenarios are paired
+# (e.g. for the extinction timing, simulations in which the wolves went extinct under both scenarios).
+
+def paired_difference(cube, metric, parameter):
+    
+    # Function estimates the mean difference Targeted - Scattered of a summary metric at one logging pressure with
+    # its standard error and 95% confidence interval. For comparison, it also returns the standard error that
+    # independent simulations would give, and how many times more independent simulations the same precision needs.
+    
+    values = cube['values'][:, list(cube['parameters']).index(parameter), :, list(cube['metrics']).index(metric)]
+    targeted = values[list(cube['scenarios']).index('Targeted')]
+    scattered = values[list(cube['scenarios']).index('Scattered')]
+    
+    pairs = ~np.isnan(targeted) & ~np.isnan(scattered)
+    targeted, scattered = targeted[pairs], scattered[pairs]
+    differences = targeted - scattered
+    n_pairs = len(differences)
+    
+    if n_pairs < 2:
+        raise ValueError('At least two paired simulations are needed')
+    
+    standard_error = np.std(differences, ddof = 1)/np.sqrt(n_pairs)
+    standard_error_independent = np.sqrt((np.var(targeted, ddof = 1) + np.var(scattered, ddof = 1))/n_pairs)
+    
+    return {'difference': differences.mean(),
+            'standard_error': standard_error,
+            'ci_low': differences.mean() - 1.96*standard_error,
+            'ci_high': differences.mean() + 1.96*standard_error,
+            'n_pairs': n_pairs,
+            'standard_error_independent': standard_error_independent,
+            'efficiency': (standard_error_independent/standard_error)**2 if standard_error > 0 else np.inf}
+
+
+def paired_differences(cube, metric):
+    
+    # Function returns the paired difference of a metric for every logging pressure simulated under both scenarios,
+    # with one row per logging pressure
+    
+    values = cube['values'][:, :, :, list(cube['metrics']).index(metric)]
+    simulated = ~np.isnan(values).all(axis = 2).any(axis = 0)
+    
+    rows = {parameter: paired_difference(cube, metric, parameter) for parameter in cube['parameters'][simulated]}
+    
+    return pd.DataFrame.from_dict(rows, orient = 'index').rename_axis('Logging pressure')
+
+
+#------------------------------------------------------------------------------
+
+# AGGREGATED PLOTTING
+
+def timestep_mean_sd(path, stubs, chunksize = 500):
+    
+    # Function reads a wide-format data set in chunks of timesteps and returns the timesteps and, for every stub
+    # (e.g. 'n_Deer' or 'n_Deer_protected'), the daily mean and standard deviation over all simulations.
+    # The standard deviation uses ddof = 1, like seaborn's errorbar = 'sd'.
+    
+    header = pd.read_csv(path, nrows = 0).columns
+    columns = {stub: [column for column in header if column.rsplit('_', 1)[0] == stub] for stub in stubs}
+    
+    timesteps = []
+    means = {stub: [] for stub in stubs}
+    sds = {stub: [] for stub in stubs}
+    
+    for chunk in pd.read_csv(path, usecols = ['timestep'] + [column for stub in stubs for column in columns[stub]], chunksize = chunksize):
+        timesteps.append(chunk.timestep.to_numpy())
+        for stub in stubs:
+            values = chunk[columns[stub]].to_numpy(dtype = float)
+            means[stub].append(np.nanmean(values, axis = 1))
+            sds[stub].append(np.nanstd(values, axis = 1, ddof = 1))
+    
+    return np.concatenate(timesteps), {stub: (np.concatenate(means[stub]), np.concatenate(sds[stub])) for stub in stubs}
+
+
+def plot_mean_sd(ax, timestep, mean_values, sd_values, label = None):
+    
+    # Function draws a daily mean with a band of +/- 1 standard deviation, in the style of seaborn's lineplot
+    
+    line, = ax.plot(timestep, mean_values, label = label)
+    ax.fill_between(timestep, mean_values - sd_values, mean_values + sd_values, color = line.get_color(), alpha = 0.2, linewidth = 0)
 
 
 #------------------------------------------------------------------------------
 
 # FUNCTIONS TO CREATE THE DIFFERENT GRAPHS DEPENDING ON SCENARIO
 
-def graph_deer_only(n_simulations, version, parameter):
+def graph_deer_only(n_simulations, version, parameter, aggregated = False):
     
     # This is Figure 9 in the paper.
     
     # Function graphs deer population dynamics for a set of simulations with logging,
     # but without predatory pressure from wolves. Shows direct effects of biomass growth,
     # as well as the carrying capacities under different forest scenarios.
+    # With aggregated, the daily mean and standard deviation are computed directly from the wide data.
     
-    data = pd.read_csv('deer_only/pop_dynam_full_deer_only_'+str(parameter)+'_v'+str(version)+'.csv')
-
-    final_data = pd.wide_to_long(data,['n_Deer','n_Wolves', 'hr_Deer', 'hr_Wolves'], sep = '_', i = 'timestep', j = 'sim').reset_index()
-
-    fig = sns.relplot(final_data, kind='line', x = 'timestep',y = 'n_Deer', errorbar='sd', height = 5, aspect = 1.6)
-    fig.set_axis_labels('Days', 'Population size')
+    path = 'deer_only/pop_dynam_full_deer_only_'+str(parameter)+'_v'+str(version)+'.csv'
+    
+    if aggregated:
+        
+        timestep, stats = timestep_mean_sd(path, ['n_Deer'])
+        
+        fig, ax = plt.subplots(figsize = (8,5))
+        plot_mean_sd(ax, timestep, *stats['n_Deer'])
+        ax.set_xlabel('Days')
+        ax.set_ylabel('Population size')
+        sns.despine()
+        
+    else:
+        
+        data = pd.read_csv(path)
+    
+        final_data = pd.wide_to_long(data,['n_Deer','n_Wolves', 'hr_Deer', 'hr_Wolves'], sep = '_', i = 'timestep', j = 'sim').reset_index()
+    
+        fig = sns.relplot(final_data, kind='line', x = 'timestep',y = 'n_Deer', errorbar='sd', height = 5, aspect = 1.6)
+        fig.set_axis_labels('Days', 'Population size')
+        
     # fig.fig.suptitle("Deer population dynamics absent predatory pressure", x = 0.5, y = 1.1, fontsize = 16)
     # fig.fig.text(0.5, 1.03, 'The figure depicts mean population levels +/- 1 standard deviation averaged over N=' + str(n_simulations) + ' simulations.' +
     #               '\nThis is a model without wolves/predatory pressure. In year 5, there is one year of logging, in which ' + str(round(parameter*9*100/121,1)) + '% of the forest is clear-cut.', 
@@ -143,20 +418,38 @@ def graph_deer_only(n_simulations, version, parameter):
 
 
 
-def graph_predator_prey(n_simulations,version, post_eq_time):
+def graph_predator_prey(n_simulations,version, post_eq_time, aggregated = False):
     
     # This is Figure 11 in the paper.
     
     # Function graphs daily mean population levels +/- 1 sdev. for both animals in the scenario
     # without logging. Could be used for all other single scenarios if slightly adapted.
+    # With aggregated, the daily mean and standard deviation are computed directly from the wide data.
     
-    data = pd.read_csv('logging_intensity/v'+str(version)+'/pop_dynam_full_log_int_0_v'+str(version)+'.csv')
-    interim = pd.wide_to_long(data,['n_Deer','n_Wolves', 'hr_Deer', 'hr_Wolves'], sep = '_', i = 'timestep', j = 'sim').reset_index()
-    final_data = pd.wide_to_long(interim, stubnames = ['n','hr'], i = ['timestep','sim'], j = 'Animal', sep = '_', suffix=r'\w+').reset_index()
-
-
-    fig = sns.relplot(final_data, kind='line', x = 'timestep',y = 'n', errorbar='sd', hue='Animal', height = 5, aspect = 1.6)
-    fig.set_axis_labels('Days', 'Population size')
+    path = 'logging_intensity/v'+str(version)+'/pop_dynam_full_log_int_0_v'+str(version)+'.csv'
+    
+    if aggregated:
+        
+        timestep, stats = timestep_mean_sd(path, ['n_Deer', 'n_Wolves'])
+        
+        fig, ax = plt.subplots(figsize = (8,5))
+        for animal in ['Deer', 'Wolves']:
+            plot_mean_sd(ax, timestep, *stats['n_'+animal], label = animal)
+        ax.set_xlabel('Days')
+        ax.set_ylabel('Population size')
+        ax.legend(title = 'Animal', frameon = False, loc = 'center left', bbox_to_anchor = (1, 0.5))
+        sns.despine()
+        
+    else:
+        
+        data = pd.read_csv(path)
+        interim = pd.wide_to_long(data,['n_Deer','n_Wolves', 'hr_Deer', 'hr_Wolves'], sep = '_', i = 'timestep', j = 'sim').reset_index()
+        final_data = pd.wide_to_long(interim, stubnames = ['n','hr'], i = ['timestep','sim'], j = 'Animal', sep = '_', suffix=r'\w+').reset_index()
+    
+    
+        fig = sns.relplot(final_data, kind='line', x = 'timestep',y = 'n', errorbar='sd', hue='Animal', height = 5, aspect = 1.6)
+        fig.set_axis_labels('Days', 'Population size')
+        
     for i in range(1,15):
         plt.axvline(x = i*360, color = 'grey', linestyle = '-', alpha = 0.3)
     plt.savefig('+graphs/predator_prey_v' + str(version) + '.png', dpi= 300, bbox_inches='tight')
@@ -170,44 +463,9 @@ def graph_population_sizes(n_simulations, parameters_unprotected, parameters_pro
     # Function graphs mean deer and wolf population sizes +/- 1 standard deviation in both logging 
     # scenarios as a function of logging pressure.
     
+    cube = load_summary_cube(parameters_unprotected, parameters_protected, version, post_eq_time)
     
-    scattered = pd.read_csv('logging_intensity/v'+str(version)+'/pop_dynam_full_log_int_'+str(parameters_unprotected[0])+'_v'+str(version)+'.csv')   
-    scattered = (scattered.loc[scattered.timestep >= post_eq_time]).filter(regex = 'timestep|n_')
-    scattered = pd.wide_to_long(scattered, ['n_Deer','n_Wolves'], 'timestep', 'sim', sep = '_').reset_index()
-    scattered = (scattered.groupby('sim').mean().reset_index()).drop('timestep', axis=1)
-    scattered = scattered.rename(columns={'n_Deer': 'n_Deer_Scattered_'+str(parameters_unprotected[0]), 'n_Wolves': 'n_Wolves_Scattered_'+str(parameters_unprotected[0])})
-
-
-    for i in parameters_unprotected[1:]:
-         
-          addon = pd.read_csv('logging_intensity/v'+str(version)+'/pop_dynam_full_log_int_'+str(i)+'_v'+str(version)+'.csv')
-          addon = (addon.loc[addon.timestep >= post_eq_time]).filter(regex = 'timestep|n_')
-          addon = pd.wide_to_long(addon, ['n_Deer','n_Wolves'], 'timestep', 'sim', sep = '_').reset_index()
-          addon = (addon.groupby('sim').mean().reset_index()).drop('timestep', axis=1)
-          addon = addon.rename(columns={'n_Deer': 'n_Deer_Scattered_'+str(i), 'n_Wolves': 'n_Wolves_Scattered_'+str(i)})
-          scattered = pd.merge(scattered, addon, how='left', on = 'sim')
-             
-            
-    targeted = pd.read_csv('protection/v'+str(version)+'/pop_dynam_only_prot_'+str(parameters_protected[0])+'_v'+str(version)+'.csv')   
-    targeted = (targeted.loc[targeted.timestep >= post_eq_time]).filter(regex = 'timestep|n_')
-    targeted = pd.wide_to_long(targeted, ['n_Deer','n_Wolves'], 'timestep', 'sim', sep = '_').reset_index()
-    targeted = (targeted.groupby('sim').mean().reset_index()).drop('timestep', axis=1)
-    targeted = targeted.rename(columns={'n_Deer': 'n_Deer_Targeted_'+str(parameters_protected[0]), 'n_Wolves': 'n_Wolves_Targeted_'+str(parameters_protected[0])})
-
-
-    for i in parameters_protected[1:]:
-         
-          addon = pd.read_csv('protection/v'+str(version)+'/pop_dynam_only_prot_'+str(i)+'_v'+str(version)+'.csv')
-          addon = (addon.loc[addon.timestep >= post_eq_time]).filter(regex = 'timestep|n_')
-          addon = pd.wide_to_long(addon, ['n_Deer','n_Wolves'], 'timestep', 'sim', sep = '_').reset_index()
-          addon = (addon.groupby('sim').mean().reset_index()).drop('timestep', axis=1)
-          addon = addon.rename(columns={'n_Deer': 'n_Deer_Targeted_'+str(i), 'n_Wolves': 'n_Wolves_Targeted_'+str(i)})
-          targeted = pd.merge(targeted, addon, how='left', on = 'sim')
-         
-    full = pd.merge(scattered, targeted, how = 'left', on = 'sim')
-    
-    full = pd.wide_to_long(full, stubnames = ['n_Deer_Scattered', 'n_Wolves_Scattered', 'n_Deer_Targeted', 'n_Wolves_Targeted'], i = 'sim', j = 'Logging pressure', sep='_').reset_index()
-    full = pd.wide_to_long(full, ['n_Deer', 'n_Wolves'], ['sim', 'Logging pressure'], 'Logging', sep = '_', suffix=r'\w+').reset_index()
+    full = cube_to_frame(cube)[['sim', 'Logging pressure', 'Logging', 'n_Deer', 'n_Wolves']]
     full = pd.wide_to_long(full, 'n', ['sim', 'Logging pressure', 'Logging'], 'Animal', sep = '_', suffix=r'\w+').reset_index()
     
     
@@ -227,43 +485,9 @@ def graph_hr_sizes(n_simulations, parameters_unprotected, parameters_protected,
     # Function graphs mean deer and wolf home range sizes +/- 1 standard deviation in both logging 
     # scenarios as a function of logging pressure.
     
-    scattered = pd.read_csv('logging_intensity/v'+str(version)+'/pop_dynam_full_log_int_'+str(parameters_unprotected[0])+'_v'+str(version)+'.csv')   
-    scattered = (scattered.loc[scattered.timestep >= post_eq_time]).filter(regex = 'timestep|hr_')
-    scattered = pd.wide_to_long(scattered, ['hr_Deer','hr_Wolves'], 'timestep', 'sim', sep = '_').reset_index()
-    scattered = (scattered.groupby('sim').agg(mean_excluding_zero).reset_index()).drop('timestep', axis=1)
-    scattered = scattered.rename(columns={'hr_Deer': 'hr_Deer_Scattered_'+str(parameters_unprotected[0]), 'hr_Wolves': 'hr_Wolves_Scattered_'+str(parameters_unprotected[0])})
-
-
-    for i in parameters_unprotected[1:]:
-         
-          addon = pd.read_csv('logging_intensity/v'+str(version)+'/pop_dynam_full_log_int_'+str(i)+'_v'+str(version)+'.csv')
-          addon = (addon.loc[addon.timestep >= post_eq_time]).filter(regex = 'timestep|hr_')
-          addon = pd.wide_to_long(addon, ['hr_Deer','hr_Wolves'], 'timestep', 'sim', sep = '_').reset_index()
-          addon = (addon.groupby('sim').agg(mean_excluding_zero).reset_index()).drop('timestep', axis=1)
-          addon = addon.rename(columns={'hr_Deer': 'hr_Deer_Scattered_'+str(i), 'hr_Wolves': 'hr_Wolves_Scattered_'+str(i)})
-          scattered = pd.merge(scattered, addon, how='left', on = 'sim')
-             
-            
-    targeted = pd.read_csv('protection/v'+str(version)+'/pop_dynam_only_prot_'+str(parameters_protected[0])+'_v'+str(version)+'.csv')   
-    targeted = (targeted.loc[targeted.timestep >= post_eq_time]).filter(regex = 'timestep|hr_')
-    targeted = pd.wide_to_long(targeted, ['hr_Deer','hr_Wolves'], 'timestep', 'sim', sep = '_').reset_index()
-    targeted = (targeted.groupby('sim').agg(mean_excluding_zero).reset_index()).drop('timestep', axis=1)
-    targeted = targeted.rename(columns={'hr_Deer': 'hr_Deer_Targeted_'+str(parameters_protected[0]), 'hr_Wolves': 'hr_Wolves_Targeted_'+str(parameters_protected[0])})
-
-
-    for i in parameters_protected[1:]:
-         
-          addon = pd.read_csv('protection/v'+str(version)+'/pop_dynam_only_prot_'+str(i)+'_v'+str(version)+'.csv')
-          addon = (addon.loc[addon.timestep >= post_eq_time]).filter(regex = 'timestep|hr_')
-          addon = pd.wide_to_long(addon, ['hr_Deer','hr_Wolves'], 'timestep', 'sim', sep = '_').reset_index()
-          addon = (addon.groupby('sim').agg(mean_excluding_zero).reset_index()).drop('timestep', axis=1)
-          addon = addon.rename(columns={'hr_Deer': 'hr_Deer_Targeted_'+str(i), 'hr_Wolves': 'hr_Wolves_Targeted_'+str(i)})
-          targeted = pd.merge(targeted, addon, how='left', on = 'sim')
-         
-    full = pd.merge(scattered, targeted, how = 'left', on = 'sim')
-    
-    full = pd.wide_to_long(full, stubnames = ['hr_Deer_Scattered', 'hr_Wolves_Scattered', 'hr_Deer_Targeted', 'hr_Wolves_Targeted'], i = 'sim', j = 'Logging pressure', sep='_').reset_index()
-    full = pd.wide_to_long(full, ['hr_Deer', 'hr_Wolves'], ['sim', 'Logging pressure'], 'Logging', sep = '_', suffix=r'\w+').reset_index()
+    cube = load_summary_cube(parameters_unprotected, parameters_protected, version, post_eq_time)
+    
+    full = cube_to_frame(cube)[['sim', 'Logging pressure', 'Logging', 'hr_Deer', 'hr_Wolves']]
     full = pd.wide_to_long(full, 'hr', ['sim', 'Logging pressure', 'Logging'], 'Animal', sep = '_', suffix=r'\w+').reset_index()
     
     fig = sns.FacetGrid(data = full, col = 'Animal', hue='Logging', hue_order = ['Targeted', 'Scattered'], height=4, aspect = 1.2, sharey=False)
@@ -281,29 +505,13 @@ def graph_extinction_rate(n_simulations, parameters_unprotected, parameters_prot
     
     # Function graphs percentage of simulations in which the wolf population went extinct for both logging 
     # scenarios as a function of logging pressure.
+    # Every logging pressure is divided by its own number of simulations, which differs after an adaptive sweep
+    # ('run_adaptive_sweep' in 'ecol_1_ensemble.py'); n_simulations is the number of simulations of a fixed sweep.
     
-    ext_rate = []
-
-    for i in parameters_unprotected:
-        pop_dynam = pd.read_csv('logging_intensity/v'+str(version)+'/pop_dynam_full_log_int_'+str(i)+'_v'+str(version)+'.csv')        
-        ext_rate.append(calculate_extinction_rate(pop_dynam, 'Wolves', n_simulations))
-
-    data = pd.DataFrame()
-    data['Logging pressure'] = parameters_unprotected
-    data['Extinction rate_Scattered'] = ext_rate
-    
-    ext_rate = []
+    cube = load_summary_cube(parameters_unprotected, parameters_protected, version, post_eq_time)
     
-    for i in parameters_protected:
-        pop_dynam = pd.read_csv('protection/v'+str(version)+'/pop_dynam_only_prot_'+str(i)+'_v'+str(version)+'.csv')
-        ext_rate.append(calculate_extinction_rate(pop_dynam, 'Wolves', n_simulations))
-        
-    addon = pd.DataFrame()
-    addon['Logging pressure'] = parameters_protected
-    addon['Extinction rate_Targeted'] = ext_rate  
-    
-    data = pd.merge(data, addon, how = 'outer', on='Logging pressure')
-    plot_data = pd.wide_to_long(data, 'Extinction rate', 'Logging pressure', 'Logging', sep='_', suffix=r'\w+').reset_index()
+    extinctions = cube_to_frame(cube).groupby(['Logging', 'Logging pressure'])['extinct_Wolves'].agg(['sum', 'count'])
+    plot_data = extinctions.apply(lambda row: round((row['sum']/row['count'])*100,1), axis = 1).rename('Extinction rate').reset_index()
     
     plt.figure(figsize = (8,5))
     sns.lineplot(data = plot_data, x = 'Logging pressure', y = 'Extinction rate', hue = 'Logging', hue_order = ['Targeted', 'Scattered'], marker = 'o')
@@ -311,29 +519,51 @@ def graph_extinction_rate(n_simulations, parameters_unprotected, parameters_prot
 
 
 
-def graph_protection(n_simulations, version, parameter, post_eq_time):
+def graph_protection(n_simulations, version, parameter, post_eq_time, aggregated = False):
     
     # This is Figure 15 in the paper.
     
     # Function graphs daily mean deer and wolf population dynamics +/- 1 standard deviation for both logging scenarios.
+    # With aggregated, the daily mean and standard deviation are computed directly from the wide data.
     
-    data = pd.read_csv('protection/v'+str(version)+'/pop_dynam_full_prot_'+str(parameter)+'_v'+str(version)+'.csv')
+    path = 'protection/v'+str(version)+'/pop_dynam_full_prot_'+str(parameter)+'_v'+str(version)+'.csv'
     
-    first_step = pd.wide_to_long(data,['n_Deer_unprotected','n_Wolves_unprotected','n_Deer_protected','n_Wolves_protected',
-                                       'hr_Deer_unprotected','hr_Wolves_unprotected','hr_Deer_protected','hr_Wolves_protected'], sep = '_', i = 'timestep', j = 'sim').reset_index()
-    second_step = pd.wide_to_long(first_step, ['n_Deer','n_Wolves', 'hr_Deer','hr_Wolves'], sep = '_', i = ['timestep','sim'], j = 'Forest', suffix=r'\w+').reset_index()
-    final_data = pd.wide_to_long(second_step, stubnames = ['n','hr'], i = ['timestep','sim','Forest'], j = 'Animal', sep = '_', suffix=r'\w+').reset_index()
-
-    final_data = final_data.rename(columns={'Forest': 'Logging'})
-    final_data['Logging'] = final_data['Logging'].replace({'protected':'Targeted', 'unprotected':'Scattered'})  
+    if aggregated:
+        
+        timestep, stats = timestep_mean_sd(path, ['n_Deer_protected', 'n_Deer_unprotected', 'n_Wolves_protected', 'n_Wolves_unprotected'])
+        
+        fig, axes = plt.subplots(1, 2, figsize = (9.6,4))
+        for ax, animal in zip(axes, ['Deer', 'Wolves']):
+            for logging, forest in [('Targeted', 'protected'), ('Scattered', 'unprotected')]:
+                plot_mean_sd(ax, timestep, *stats['n_'+animal+'_'+forest], label = logging)
+            ax.set_title('Animal = ' + animal)
+            ax.set_xlabel('Days')
+            ax.axvline(x = start_of_logging, color = 'black', linestyle = '--', linewidth = 1)
+            ax.axvline(x = stop_of_logging, color = 'black', linestyle = '--', linewidth = 1)
+            ax.axvline(x = stop_of_logging + end_of_seral_forest, color = 'black', linestyle = '--', linewidth = 1)
+        axes[0].set_ylabel('Population size')
+        axes[1].legend(title = 'Logging', frameon = False, loc = 'center left', bbox_to_anchor = (1, 0.5))
+        sns.despine()
+        
+    else:
+        
+        data = pd.read_csv(path)
+        
+        first_step = pd.wide_to_long(data,['n_Deer_unprotected','n_Wolves_unprotected','n_Deer_protected','n_Wolves_protected',
+                                           'hr_Deer_unprotected','hr_Wolves_unprotected','hr_Deer_protected','hr_Wolves_protected'], sep = '_', i = 'timestep', j = 'sim').reset_index()
+        second_step = pd.wide_to_long(first_step, ['n_Deer','n_Wolves', 'hr_Deer','hr_Wolves'], sep = '_', i = ['timestep','sim'], j = 'Forest', suffix=r'\w+').reset_index()
+        final_data = pd.wide_to_long(second_step, stubnames = ['n','hr'], i = ['timestep','sim','Forest'], j = 'Animal', sep = '_', suffix=r'\w+').reset_index()
     
-    fig = sns.FacetGrid(data = final_data, col = 'Animal', hue='Logging', hue_order = ['Targeted', 'Scattered'], height=4, aspect = 1.2, sharey=False)
-    fig.map_dataframe(sns.lineplot, x= 'timestep', y= 'n', errorbar= 'sd')
-    fig.add_legend()
-    fig.set_axis_labels('Days', 'Population size')
-    fig.map(plt.axvline, x = start_of_logging, color = 'black', linestyle = '--', linewidth = 1)
-    fig.map(plt.axvline, x = stop_of_logging, color = 'black', linestyle = '--', linewidth = 1)
-    fig.map(plt.axvline, x = stop_of_logging + end_of_seral_forest, color = 'black', linestyle = '--', linewidth = 1)
+        final_data = final_data.rename(columns={'Forest': 'Logging'})
+        final_data['Logging'] = final_data['Logging'].replace({'protected':'Targeted', 'unprotected':'Scattered'})  
+        
+        fig = sns.FacetGrid(data = final_data, col = 'Animal', hue='Logging', hue_order = ['Targeted', 'Scattered'], height=4, aspect = 1.2, sharey=False)
+        fig.map_dataframe(sns.lineplot, x= 'timestep', y= 'n', errorbar= 'sd')
+        fig.add_legend()
+        fig.set_axis_labels('Days', 'Population size')
+        fig.map(plt.axvline, x = start_of_logging, color = 'black', linestyle = '--', linewidth = 1)
+        fig.map(plt.axvline, x = stop_of_logging, color = 'black', linestyle = '--', linewidth = 1)
+        fig.map(plt.axvline, x = stop_of_logging + end_of_seral_forest, color = 'black', linestyle = '--', linewidth = 1)
 
     plt.savefig('+graphs/protection_'+str(parameter)+'_v' + str(version) + '.png', dpi= 300, bbox_inches='tight')
 
@@ -344,8 +574,12 @@ def graph_extinction_timing(n_simulations, version, parameter):
     # This is Figure 16 in the paper.
     
     # Function graphs a layered histogram comparing extinction timings between the two logging scenarios.
+    # The timings do not depend on the post-equilibrium time, so they are read from the full protection data set
+    # (only the wolf population columns) instead of a summary cube.
     
-    data = pd.read_csv('protection/v'+str(version)+'/pop_dynam_full_prot_'+str(parameter)+'_v'+str(version)+'.csv')
+    path = 'protection/v'+str(version)+'/pop_dynam_full_prot_'+str(parameter)+'_v'+str(version)+'.csv'
+    header = pd.read_csv(path, nrows = 0).columns
+    data = pd.read_csv(path, usecols = [column for column in header if column.startswith('n_Wolves_')])
 
     extinction_data = pd.DataFrame(list(range(1,n_simulations+1)), columns= ['Simulation'])
     
@@ -367,11 +601,18 @@ def graph_extinction_timing(n_simulations, version, parameter):
 
 # EXECUTE
 
-#graph_deer_only(n_simulations = 100, version = 1, parameter = 8)
-#graph_predator_prey(n_simulations = 1000, version = 1, post_eq_time = 4000)
-#graph_population_sizes(n_simulations= 1000, parameters_unprotected = list(range(0,14)), parameters_protected = list(range(1,13)) , version = 1, post_eq_time = 4000)
-#graph_hr_sizes(n_simulations= 1000, parameters_unprotected = list(range(0,14)), parameters_protected = list(range(1,13)) , version = 1, post_eq_time = 4000)
-#graph_extinction_rate(n_simulations= 1000, parameters_unprotected = list(range(0,14)), parameters_protected = list(range(1,13)) , version = 1, post_eq_time = 4000)
-#graph_protection(n_simulations = 1000, version = 1, parameter = 7, post_eq_time = 4000)
-#graph_extinction_timing(n_simulations = 1000, version = 1, parameter = 7)
+# Only changes into the output folder when the script is executed directly, so that other scripts can import it
+
+if __name__ == '__main__':
+
+    os.chdir('C:/Users/Kamal/OneDrive/TSE/M2 EE/thesis/ecol/model/output/')
+
+    #graph_deer_only(n_simulations = 100, version = 1, parameter = 8)
+    #graph_predator_prey(n_simulations = 1000, version = 1, post_eq_time = 4000, aggregated = True)
+    #graph_population_sizes(n_simulations= 1000, parameters_unprotected = list(range(0,14)), parameters_protected = list(range(1,13)) , version = 1, post_eq_time = 4000)
+    #graph_hr_sizes(n_simulations= 1000, parameters_unprotected = list(range(0,14)), parameters_protected = list(range(1,13)) , version = 1, post_eq_time = 4000)
+    #graph_extinction_rate(n_simulations= 1000, parameters_unprotected = list(range(0,14)), parameters_protected = list(range(1,13)) , version = 1, post_eq_time = 4000)
+    #graph_protection(n_simulations = 1000, version = 1, parameter = 7, post_eq_time = 4000, aggregated = True)
+    #graph_extinction_timing(n_simulations = 1000, version = 1, parameter = 7)
+    #paired_differences(load_summary_cube(parameters_unprotected = [7], parameters_protected = [7], version = 2, post_eq_time = 4000), 'n_Wolves')
 
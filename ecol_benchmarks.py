@@ -0,0 +1,234 @@
+# BENCHMARKS FOR THE WOLF-DEER-MODEL IN LOGGED FOREST
+
+# Author: Peter Kamal
+# Python version: 3.9.13
+# Last update: 17/10/26
+
+# Note: This script times the model, its hot functions and the analysis pipeline, so that changes can be checked for
+# speed. The timings are stored as a JSON baseline and later runs are compared against it: a benchmark that takes
+# more than (1 + threshold) times its baseline is flagged as a regression. Baselines depend on the machine, so they
+# are kept locally in 'benchmarks' and not shared.
+# All input data (replicate files and merged data sets) is synthetic and generated in a temporary folder, so the
+# benchmarks run offline and without the output of real simulations.
+
+#------------------------------------------------------------------------------
+
+# IMPORTS
+import os
+import sys
+import copy
+import json
+import time
+import platform
+import tempfile
+import random as rd
+import numpy as np
+import pandas as pd
+from dataclasses import replace
+import ecol_1_model as model
+import ecol_1_ensemble as ensemble
+import ecol_2_data_transformation as transformation
+import ecol_3_data_analysis as analysis
+
+#------------------------------------------------------------------------------
+
+# SETTINGS
+
+# Short simulations that still include logging, at several (landscape_size, n_deers, n_wolves) settings
+benchmark_config = replace(model.default_config, years = 3, start_of_logging = 360, stop_of_logging = 720)
+simulation_settings = [(9, 120, 6), (11, 180, 10), (15, 330, 18)]
+
+# Engines timed at every simulation setting (see 'ecol_1_ensemble.py') and the number of replicates of a batch
+simulation_engines = ['object', 'vectorized', 'batched']
+n_batch_replicates = 8
+
+# Size of the synthetic data sets for the analysis pipeline
+n_fixture_simulations = 100
+n_fixture_timesteps = 5400
+
+baseline_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baseline.json')
+
+#------------------------------------------------------------------------------
+
+# HELPER FUNCTIONS
+
+# Function that returns the shortest wall time of several calls. Setup (not timed) returns the arguments of every call,
+# e.g. a fresh copy of an environment for functions that change it.
+def time_function(function, setup = None, repeats = 5):
+
+    times = []
+    for repeat in range(repeats):
+        arguments = setup() if setup is not None else ()
+        start = time.perf_counter()
+        function(*arguments)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+# Function that returns a new environment of an engine with seeded random number generators, so that every run does
+# the same work (all replicates of a batch draw from the global generators)
+def seeded_environment(config = benchmark_config, seed = 1, engine = 'object'):
+
+    rd.seed(seed)
+    np.random.seed(seed)
+
+    if engine == 'batched':
+        return ensemble.new_environment(engine, False, config, [model.global_streams]*n_batch_replicates)
+
+    return ensemble.new_environment(engine, False, config)
+
+
+# Function that returns an environment after one year of simulation, as the starting point for the hot functions
+def burned_in_environment(config = benchmark_config, seed = 1):
+
+    environment = seeded_environment(config, seed)
+    environment.simulation(until = config.length_year)
+
+    return environment
+
+
+#------------------------------------------------------------------------------
+
+# SYNTHETIC FIXTURES
+
+def synthetic_pop_dynam(rng, n_timesteps = n_fixture_timesteps):
+
+    # Returns the population dynamics of one made-up simulation in the format of the model output:
+    # random walks around typical population sizes, with the wolves going extinct in about half of the simulations
+    timestep = np.arange(n_timesteps + 1)
+    n_deer = np.maximum(180 + np.cumsum(rng.integers(-3, 4, n_timesteps + 1)), 0)
+    n_wolves = np.maximum(10 + np.cumsum(rng.integers(-1, 2, n_timesteps + 1)), 0)
+
+    if rng.random() < 0.5:
+        n_wolves[rng.integers(n_timesteps//2, n_timesteps):] = 0
+
+    return pd.DataFrame({'timestep': timestep,
+                         'n_deer': n_deer,
+                         'n_wolves': n_wolves,
+                         'hr_deer': np.where(n_deer > 0, rng.uniform(8, 12, n_timesteps + 1), 0),
+                         'hr_wolves': np.where(n_wolves > 0, rng.uniform(30, 50, n_timesteps + 1), 0)})
+
+
+def write_fixtures(folder, n_simulations = n_fixture_simulations, parameter = 7, version = 0, seed = 1):
+
+    # Writes synthetic replicate files in the folder structure of the model output (see 'ecol_1_ensemble.py'),
+    # for the unprotected and the protected scenario
+    rng = np.random.default_rng(seed)
+
+    for scenario in ['logging_intensity', 'protection']:
+        replicate_folder = os.path.join(folder, scenario, 'v' + str(version), str(parameter))
+        os.makedirs(replicate_folder, exist_ok = True)
+        for i in range(1, n_simulations + 1):
+            synthetic_pop_dynam(rng).to_csv(os.path.join(replicate_folder, 'pop_dynam_' + str(i) + '.csv'), index = False)
+
+
+#------------------------------------------------------------------------------
+
+# BENCHMARKS
+
+def run_benchmarks(repeats = 5):
+
+    # Runs all benchmarks and returns the shortest wall time of each in seconds
+    results = {}
+
+    # Complete simulations with every engine (the batched engine runs n_batch_replicates simulations at once)
+    for landscape_size, n_deers, n_wolves in simulation_settings:
+        config = replace(benchmark_config, landscape_size = landscape_size, n_deers = n_deers, n_wolves = n_wolves)
+        for engine in simulation_engines:
+            name = 'simulation_L' + str(landscape_size) + '_D' + str(n_deers) + '_W' + str(n_wolves)
+            if engine == 'vectorized':
+                name += '_vectorized'
+            elif engine == 'batched':
+                name += '_batched' + str(n_batch_replicates)
+            results[name] = time_function(lambda environment: environment.simulation(),
+                                          lambda: (seeded_environment(config, engine = engine),), max(1, repeats//2))
+
+    # Hot functions, on copies of an environment after one year (they take microseconds, so they are repeated more often)
+    environment = burned_in_environment()
+    fresh_copy = lambda: (copy.deepcopy(environment, model.shared_objects(environment)),)
+    timestep = environment.timestep + 1
+
+    results['cell_choice'] = time_function(lambda copied: [model.cell_choice(deer.position, deer.memory, timestep, deer.config)
+                                                           for deer in copied.deers], fresh_copy, 20*repeats)
+    results['available_food'] = time_function(environment.available_food, repeats = 20*repeats)
+    results['predation'] = time_function(lambda copied: copied.predation(), fresh_copy, 20*repeats)
+    results['reproduction'] = time_function(lambda copied: copied.reproduction(), fresh_copy, 20*repeats)
+
+    # Analysis pipeline on synthetic replicate files
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+
+        write_fixtures(folder)
+        os.chdir(folder)
+        try:
+            results['create_pop_dynam'] = time_function(lambda: transformation.create_pop_dynam('protection_full', n_fixture_simulations, 0, 7),
+                                                        repeats = max(1, repeats//2))
+            transformation.create_pop_dynam('logging_intensity', n_fixture_simulations, 0, 7)
+            data = pd.read_csv('logging_intensity/v0/pop_dynam_full_log_int_7_v0.csv')
+        finally:
+            os.chdir(working_directory)
+
+    results['calculate_extinction_rate'] = time_function(lambda: analysis.calculate_extinction_rate(data, 'Wolves', n_fixture_simulations), repeats = repeats)
+    results['calculate_mean_pop_size'] = time_function(lambda: analysis.calculate_mean_pop_size(data, 'Wolves', 4000), repeats = repeats)
+    results['calculate_mean_hr_size'] = time_function(lambda: analysis.calculate_mean_hr_size(data, 'Wolves', 4000), repeats = repeats)
+    results['calculate_extinction_timing'] = time_function(lambda: analysis.calculate_extinction_timing(data, 'Wolves'), repeats = repeats)
+    results['summarize_pop_dynam'] = time_function(lambda: analysis.summarize_pop_dynam(data, 4000), repeats = repeats)
+
+    return results
+
+
+#------------------------------------------------------------------------------
+
+# BASELINES
+
+def save_baseline(results, path = baseline_path):
+
+    # Stores the timings together with the machine they were taken on
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    baseline = {'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'results': results}
+
+    with open(path, 'w') as file:
+        json.dump(baseline, file, indent = 2)
+
+
+def compare_to_baseline(results, path = baseline_path, threshold = 0.2):
+
+    # Returns one row per benchmark with the baseline and current time, their ratio and whether the benchmark
+    # slowed down by more than the threshold (benchmarks missing from the baseline are never flagged)
+    with open(path) as file:
+        baseline = json.load(file)['results']
+
+    comparison = pd.DataFrame({'baseline': pd.Series(baseline, dtype = float), 'current': pd.Series(results, dtype = float)})
+    comparison = comparison.loc[list(results)]
+    comparison['ratio'] = comparison.current/comparison.baseline
+    comparison['regression'] = comparison.ratio > 1 + threshold
+
+    return comparison
+
+
+#------------------------------------------------------------------------------
+
+# EXECUTE
+
+# The first run stores the baseline, later runs are compared against it. To accept new timings as the baseline,
+# delete 'benchmarks/baseline.json' or call save_baseline(results).
+
+if __name__ == '__main__':
+
+    results = run_benchmarks()
+
+    if os.path.exists(baseline_path):
+        comparison = compare_to_baseline(results)
+        print(comparison)
+        if comparison.regression.any():
+            print('Regressions: ' + ', '.join(comparison.index[comparison.regression]))
+            sys.exit(1)
+    else:
+        save_baseline(results)
+        print(pd.Series(results, name = 'seconds'))
+        print('Baseline stored in ' + baseline_path)